@@ -0,0 +1,298 @@
+import json
+import os
+import numpy as np
+from typing import Any, Dict, Iterator, Optional, Tuple, TYPE_CHECKING
+from aimakerspace.chunkstore import ChunkStore, hash_texts
+from aimakerspace.metadata import MetadataStore, _Column
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+if TYPE_CHECKING:
+    from aimakerspace.vectordatabase import VectorDatabase
+
+# File formats of VectorDatabase.export_arrow / import_arrow.
+ARROW_FORMATS = ("ipc", "parquet")
+
+# Version of the table layout, kept in the schema metadata with the model
+# details that VectorDatabase.load checks from its sidecar.
+ARROW_FORMAT_VERSION = 1
+_SCHEMA_KEY = b"aimakerspace"
+
+# Vector bytes per Parquet row group. Readers decode a whole group at a time,
+# using a few times its size, so groups stay well below the matrix size.
+_PARQUET_GROUP_BYTES = 32 * 2**20
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError(
+            "Arrow and Parquet import/export need pyarrow: pip install pyarrow"
+        )
+
+
+def _format_of(path: str, format: Optional[str]) -> str:
+    if format is None:
+        format = "parquet" if path.endswith((".parquet", ".pq")) else "ipc"
+    if format not in ARROW_FORMATS:
+        raise ValueError(
+            f"Unknown Arrow format {format!r}; expected one of {ARROW_FORMATS}"
+        )
+    return format
+
+
+def _schema(db: "VectorDatabase") -> "pa.Schema":
+    fields = [
+        pa.field("id", pa.int64(), nullable=False),
+        pa.field("text", pa.large_string(), nullable=False),
+        pa.field("hash", pa.uint64(), nullable=False),
+        pa.field("norm", pa.float32(), nullable=False),
+        pa.field(
+            "vector",
+            pa.list_(pa.from_numpy_dtype(db.dtype), db._matrix.shape[1]),
+            nullable=False,
+        ),
+    ]
+    columns = db._metadata.columns
+    if columns:
+        fields.append(
+            pa.field(
+                "metadata",
+                pa.struct(
+                    [
+                        pa.field(name, pa.dictionary(pa.int32(), _value_type(db, name)))
+                        for name in columns
+                    ]
+                ),
+            )
+        )
+    details = {
+        "format_version": ARROW_FORMAT_VERSION,
+        "embedding_model": getattr(db.embedding_model, "embeddings_model_name", None),
+        "embedding_dimensions": getattr(db.embedding_model, "dimensions", None),
+        "next_id": db._next_id,
+    }
+    return pa.schema(fields, metadata={_SCHEMA_KEY: json.dumps(details)})
+
+
+def _value_type(db: "VectorDatabase", name: str) -> "pa.DataType":
+    values = db._metadata._columns[name].values
+    return pa.array(values).type if values else pa.null()
+
+
+def record_batches(
+    db: "VectorDatabase", batch_size: Optional[int] = None
+) -> Iterator["pa.RecordBatch"]:
+    """
+    The database as record batches of at most ``batch_size`` rows (one
+    batch when None). The columns wrap the database's own arrays, so no
+    per-row Python objects are made; the database must be compacted.
+    """
+    schema = _schema(db)
+    count = db._count
+    dim = db._matrix.shape[1]
+    buffer, offsets = db._chunks.state()
+    text_data = pa.py_buffer(buffer)
+    metadata_fields = list(schema.field("metadata").type) if db._metadata.columns else []
+    columns_and_types = [
+        (db._metadata._columns[field.name], field.type) for field in metadata_fields
+    ]
+    step = batch_size or max(count, 1)
+    for start in range(0, max(count, 1), step):
+        stop = min(start + step, count)
+        rows = stop - start
+        texts = pa.LargeStringArray.from_buffers(
+            rows, pa.py_buffer(offsets[start : stop + 1]), text_data
+        )
+        vectors = pa.FixedSizeListArray.from_arrays(
+            pa.array(db._matrix[start:stop].reshape(-1)), dim
+        )
+        columns = [
+            pa.array(db._ids[start:stop]),
+            texts,
+            pa.array(db._hashes[start:stop]),
+            pa.array(db._norms[start:stop]),
+            vectors,
+        ]
+        if columns_and_types:
+            children = []
+            for column, dictionary_type in columns_and_types:
+                codes = np.full(rows, -1, dtype=np.int32)
+                stored = column.codes[start:stop]
+                codes[: len(stored)] = stored
+                children.append(
+                    pa.DictionaryArray.from_arrays(
+                        pa.array(codes, mask=codes < 0),
+                        pa.array(column.values, type=dictionary_type.value_type),
+                    )
+                )
+            columns.append(pa.StructArray.from_arrays(children, fields=metadata_fields))
+        yield pa.RecordBatch.from_arrays(columns, schema=schema)
+
+
+def export_arrow(
+    db: "VectorDatabase",
+    path: str,
+    format: Optional[str] = None,
+    batch_size: Optional[int] = None,
+) -> None:
+    """See ``VectorDatabase.export_arrow``."""
+    _require_pyarrow()
+    format = _format_of(path, format)
+    if not db._matrix.shape[1]:
+        raise ValueError(
+            "Cannot export a VectorDatabase that has never held a vector: "
+            "its vector width is unknown"
+        )
+    db.compact()
+    schema = _schema(db)
+    # Written beside the target and renamed over it, like VectorDatabase.save,
+    # so databases imported zero-copy from ``path`` keep their mapping valid.
+    tmp_path = path + ".tmp"
+    if format == "ipc":
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for batch in record_batches(db, batch_size):
+                writer.write_batch(batch)
+    else:
+        row_bytes = db._matrix.shape[1] * db.dtype.itemsize
+        batch_size = batch_size or max(_PARQUET_GROUP_BYTES // row_bytes, 1)
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for batch in record_batches(db, batch_size):
+                writer.write_batch(batch)
+    os.replace(tmp_path, path)
+
+
+def _open_batches(
+    path: str, format: str
+) -> Tuple["pa.Schema", int, Iterator["pa.RecordBatch"]]:
+    """Schema, row count and record batches of a file, read lazily."""
+    if format == "parquet":
+        parquet = pq.ParquetFile(path)
+        return (
+            parquet.schema_arrow,
+            parquet.metadata.num_rows,
+            (
+                batch
+                for group in range(parquet.num_row_groups)
+                for batch in parquet.read_row_group(group).to_batches()
+            ),
+        )
+    # Memory-mapped: the batches' buffers point into the file.
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    batches = [reader.get_batch(i) for i in range(reader.num_record_batches)]
+    return reader.schema, sum(batch.num_rows for batch in batches), iter(batches)
+
+
+def _numpy(column: "pa.ChunkedArray", dtype: Any) -> np.ndarray:
+    """A zero-copy view of a one-chunk column, else one contiguous copy."""
+    if column.num_chunks == 1:
+        array = column.chunk(0).to_numpy(zero_copy_only=False)
+    else:
+        array = np.concatenate(
+            [chunk.to_numpy(zero_copy_only=False) for chunk in column.chunks]
+        )
+    return array.astype(dtype, copy=False)
+
+
+def import_arrow(db: "VectorDatabase", path: str, format: Optional[str] = None) -> None:
+    """Fills the empty ``db``; see ``VectorDatabase.import_arrow``."""
+    _require_pyarrow()
+    format = _format_of(path, format)
+    schema, count, batches = _open_batches(path, format)
+    details: Dict[str, Any] = json.loads(
+        (schema.metadata or {}).get(_SCHEMA_KEY, b"{}")
+    )
+    if details.get("format_version", ARROW_FORMAT_VERSION) != ARROW_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported Arrow table version: {details['format_version']}"
+        )
+    model_name = getattr(db.embedding_model, "embeddings_model_name", None)
+    if details.get("embedding_model") and model_name != details["embedding_model"]:
+        raise ValueError(
+            f"Index was built with {details['embedding_model']}, not {model_name}"
+        )
+    dimensions = getattr(db.embedding_model, "dimensions", None)
+    if details.get("embedding_model") and dimensions != details.get(
+        "embedding_dimensions"
+    ):
+        raise ValueError(
+            f"Index was built with dimensions={details.get('embedding_dimensions')}, "
+            f"not {dimensions}"
+        )
+    vector_type = schema.field("vector").type
+    dim = vector_type.list_size
+    dtype = np.dtype(vector_type.value_type.to_pandas_dtype())
+    if dtype.name not in ("float32", "float16"):
+        raise ValueError(f"Unsupported vector dtype: {dtype}")
+    # Vectors go straight into the matrix batch by batch (a table that is a
+    # single batch is used in place); the small columns are gathered.
+    rest_schema = pa.schema([field for field in schema if field.name != "vector"])
+    matrix, rest, start, in_place = None, [], 0, False
+    for batch in batches:
+        vectors = batch.column("vector").flatten().to_numpy(zero_copy_only=False)
+        vectors = vectors.reshape(batch.num_rows, dim)
+        if matrix is None and batch.num_rows == count:
+            matrix, in_place = vectors, True
+        else:
+            if matrix is None:
+                matrix = np.empty((count, dim), dtype=dtype)
+            matrix[start : start + batch.num_rows] = vectors
+        start += batch.num_rows
+        rest.append(
+            pa.RecordBatch.from_arrays(
+                [batch.column(field.name) for field in rest_schema], schema=rest_schema
+            )
+        )
+    table = pa.Table.from_batches(rest, schema=rest_schema)
+    db.dtype = dtype
+    db._matrix = matrix if matrix is not None else np.empty((0, dim), dtype=dtype)
+    # An IPC matrix used in place still points into the mapped file.
+    db._memory_mapped = in_place and format == "ipc"
+    if "norm" in table.column_names:
+        db._norms = _numpy(table.column("norm"), np.float32)
+    else:
+        # Vectors written by other tools: normalize them on the way in.
+        matrix = db._matrix.astype(np.float32)
+        db._norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+        safe_norms = np.where(db._norms == 0, 1, db._norms)
+        db._matrix = (matrix / safe_norms[:, None]).astype(dtype)
+        db._memory_mapped = False
+    texts = table.column("text").combine_chunks().cast(pa.large_string())
+    _, offsets, data = texts.buffers()
+    buffer = np.empty(0, dtype=np.uint8) if data is None else np.frombuffer(data, np.uint8)
+    offsets = np.frombuffer(offsets, dtype=np.int64)
+    db._chunks = ChunkStore.from_state(
+        buffer, offsets[texts.offset : texts.offset + count + 1]
+    )
+    if "hash" in table.column_names:
+        db._hashes = _numpy(table.column("hash"), np.uint64)
+    else:
+        db._hashes = hash_texts(db._chunks.get_many(range(count)))
+    if "id" in table.column_names:
+        db._ids = _numpy(table.column("id"), np.int64)
+    else:
+        db._ids = np.arange(count, dtype=np.int64)
+    if count and np.any(np.diff(db._ids) <= 0):
+        raise ValueError("Chunk ids must increase with the row number")
+    db._next_id = max(details.get("next_id", 0), int(db._ids[-1]) + 1 if count else 0)
+    db._count = count
+    db._alive = np.ones(count, dtype=bool)
+    db._metadata = MetadataStore()
+    if "metadata" in table.column_names:
+        # Parquet row groups can each carry their own dictionaries.
+        metadata = table.select(["metadata"]).unify_dictionaries()
+        metadata = metadata.column(0).combine_chunks()
+        for i, field in enumerate(metadata.type):
+            encoded = metadata.field(i)
+            if not pa.types.is_dictionary(encoded.type):
+                encoded = encoded.dictionary_encode()
+            column = db._metadata._columns[field.name] = _Column()
+            column.values = encoded.dictionary.to_pylist()
+            column.lookup = {value: code for code, value in enumerate(column.values)}
+            column.codes = encoded.indices.fill_null(-1).to_numpy().astype(np.int32)
+            if metadata.null_count:
+                column.codes[~metadata.is_valid().to_numpy(zero_copy_only=False)] = -1
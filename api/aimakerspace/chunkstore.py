@@ -0,0 +1,110 @@
+import hashlib
+import numpy as np
+from typing import List, Tuple
+from aimakerspace.indexes.base import read_only
+
+
+def hash_texts(texts: List[str]) -> np.ndarray:
+    """64-bit BLAKE2b fingerprints of ``texts``, for finding chunks by content."""
+    return np.array(
+        [
+            int.from_bytes(
+                hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            for text in texts
+        ],
+        dtype=np.uint64,
+    )
+
+
+class ChunkStore:
+    """
+    Append-only chunk text store addressed by row number.
+
+    All chunks share one contiguous UTF-8 buffer, with an offsets array
+    marking where each one starts, so the store costs two arrays instead of
+    one Python string per chunk. Text is decoded only when a chunk is read.
+    """
+
+    def __init__(self):
+        self._buffer = np.empty(0, dtype=np.uint8)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of text plus offsets held for the stored chunks."""
+        return int(self._offsets[self._count]) + 8 * (self._count + 1)
+
+    def append(self, texts: List[str]) -> None:
+        encoded = [text.encode("utf-8") for text in texts]
+        end = int(self._offsets[self._count])
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        needed = end + int(lengths.sum())
+        if needed > len(self._buffer) or not self._buffer.flags.writeable:
+            buffer = np.empty(max(needed, 2 * len(self._buffer), 4096), dtype=np.uint8)
+            buffer[:end] = self._buffer[:end]
+            self._buffer = buffer
+        rows = self._count + len(encoded) + 1
+        if rows > len(self._offsets) or not self._offsets.flags.writeable:
+            offsets = np.empty(max(rows, 2 * len(self._offsets), 64), dtype=np.int64)
+            offsets[: self._count + 1] = self._offsets[: self._count + 1]
+            self._offsets = offsets
+        self._buffer[end:needed] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        self._offsets[self._count + 1 : rows] = end + np.cumsum(lengths)
+        self._count += len(encoded)
+
+    def get(self, row: int) -> str:
+        start, end = self._offsets[row], self._offsets[row + 1]
+        return self._buffer[start:end].tobytes().decode("utf-8")
+
+    def get_many(self, rows: List[int]) -> List[str]:
+        return [self.get(row) for row in rows]
+
+    def copy(self) -> "ChunkStore":
+        """
+        A store sharing this one's text. The copy appends after the shared
+        text in place, so this store switches to read-only views and
+        reallocates on its next append.
+        """
+        store = ChunkStore()
+        store._buffer, store._offsets = self._buffer, self._offsets
+        store._count = self._count
+        self._buffer, self._offsets = read_only(self._buffer), read_only(self._offsets)
+        return store
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Keeps only rows ``keep`` (ascending), renumbered in order."""
+        keep = np.asarray(keep, dtype=np.int64)
+        starts = self._offsets[keep]
+        lengths = self._offsets[keep + 1] - starts
+        offsets = np.zeros(max(len(keep) + 1, 64), dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1 : len(keep) + 1])
+        buffer = np.empty(max(int(offsets[len(keep)]), 4096), dtype=np.uint8)
+        # Copy runs of consecutive kept rows with one slice each.
+        breaks = np.flatnonzero(np.diff(keep) != 1) + 1
+        for first, last in zip(
+            np.concatenate([[0], breaks]), np.concatenate([breaks, [len(keep)]])
+        ):
+            if first == last:
+                continue
+            source = slice(starts[first], starts[last - 1] + lengths[last - 1])
+            buffer[offsets[first] : offsets[last]] = self._buffer[source]
+        self._buffer, self._offsets, self._count = buffer, offsets, len(keep)
+
+    def state(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The used part of the buffer and the offsets, for saving."""
+        return (
+            self._buffer[: self._offsets[self._count]],
+            self._offsets[: self._count + 1],
+        )
+
+    @classmethod
+    def from_state(cls, buffer: np.ndarray, offsets: np.ndarray) -> "ChunkStore":
+        store = cls()
+        store._buffer, store._offsets = buffer, offsets
+        store._count = len(offsets) - 1
+        return store
@@ -0,0 +1,251 @@
+import copy
+import re
+import numpy as np
+from typing import Any, Dict, List, Set, Tuple
+
+# What happens to a near-duplicate in VectorDatabase.abuild_from_list:
+# "drop" leaves it out of the index; "reuse" stores it, with its own text and
+# metadata, under the embedding of the chunk it duplicates.
+DEDUP_ACTIONS = ("drop", "reuse")
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Multiplier of the polynomial rolling hash over shingle code points.
+_SHINGLE_BASE = np.uint64(1_000_003)
+
+
+def _best_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """
+    Bands and rows per band (a divisor pair of ``num_perm``) whose LSH
+    S-curve midpoint ``(1 / bands) ** (1 / rows)`` is the highest one at or
+    below ``threshold``. Erring low keeps pairs near the threshold likely to
+    share a bucket; the signature comparison then rejects false candidates.
+    """
+    pairs = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    midpoint = lambda pair: (1 / pair[0]) ** (1 / pair[1])
+    below = [pair for pair in pairs if midpoint(pair) <= threshold]
+    return max(below, key=midpoint) if below else min(pairs, key=midpoint)
+
+
+class MinHashDeduplicator:
+    """
+    Near-duplicate detection over chunk text with MinHash and LSH banding.
+
+    Each chunk becomes the set of its character shingles (after lowercasing
+    and collapsing whitespace), summarized by a ``num_perm``-value MinHash
+    signature whose agreement rate estimates the Jaccard similarity of two
+    sets. Signatures are split into bands hashed into buckets, so a chunk is
+    only compared with the few chunks sharing a bucket, and a candidate
+    counts as a duplicate when its estimated similarity reaches
+    ``threshold``.
+
+    The deduplicator remembers the chunk ids of everything it has let into
+    a database, so later batches are checked against earlier ones; the
+    database forgets ids as their chunks are deleted.
+
+    Signatures and ids are append-only arrays that the band buckets index
+    by position, so ``copy`` (as ``VectorDatabase.copy`` does per version)
+    shares them and only copies the set of removed positions. The newest
+    copy appends in place; positions past a version's own count are
+    invisible to it, and an older version takes private copies before
+    its next write.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        shingle_size: int = 9,
+        action: str = "drop",
+        seed: int = 0,
+    ):
+        """
+        :param threshold: Estimated Jaccard similarity from which chunks
+            are near-duplicates
+        :param num_perm: MinHash values per signature; more is more precise
+        :param shingle_size: Characters per shingle
+        :param action: One of ``DEDUP_ACTIONS``
+        :param seed: Seed for the hash functions
+        """
+        if action not in DEDUP_ACTIONS:
+            raise ValueError(
+                f"Unknown dedup action {action!r}; expected one of {DEDUP_ACTIONS}"
+            )
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.action = action
+        self.bands, self.rows_per_band = _best_bands(num_perm, threshold)
+        rng = np.random.default_rng(seed)
+        # Multiply-add-shift hashing: odd multipliers, top 32 bits kept.
+        self._multipliers = rng.integers(0, 2**63, num_perm, dtype=np.uint64) * 2 + 1
+        self._offsets = rng.integers(0, 2**63, num_perm, dtype=np.uint64)
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._count = 0
+        self._removed: Set[int] = set()
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        # Whether this version may append to the shared arrays and buckets.
+        self._owner = True
+        self.checked = 0
+        self.duplicates = 0
+        self.request_bytes_saved = 0
+        self.stored_bytes_saved = 0
+
+    def __len__(self) -> int:
+        return self._count - len(self._removed)
+
+    def copy(self) -> "MinHashDeduplicator":
+        """
+        A copy sharing the remembered chunks, in time independent of how
+        many there are. The copy takes over appending; see the class notes.
+        """
+        other = copy.copy(self)
+        other._removed = set(self._removed)
+        self._owner = False
+        return other
+
+    def _rebuild(self, capacity: int) -> None:
+        """Private arrays and buckets holding only the live positions."""
+        keep = [
+            position
+            for position in range(self._count)
+            if position not in self._removed
+        ]
+        signatures = np.empty((capacity, self.num_perm), dtype=np.uint32)
+        signatures[: len(keep)] = self._signatures[keep]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: len(keep)] = self._ids[keep]
+        self._signatures, self._ids = signatures, ids
+        self._count = len(keep)
+        self._removed = set()
+        self._buckets = [{} for _ in range(self.bands)]
+        for position in range(self._count):
+            self._index(position)
+        self._owner = True
+
+    def _index(self, position: int) -> None:
+        for band, key in enumerate(self._band_keys(self._signatures[position])):
+            self._buckets[band].setdefault(key, []).append(position)
+
+    def _shingle_hashes(self, text: str) -> np.ndarray:
+        """Distinct 32-bit hashes of the text's character shingles."""
+        text = _WHITESPACE.sub(" ", text.lower()).strip()
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        width = min(self.shingle_size, len(codes))
+        count = len(codes) - width + 1
+        hashes = np.zeros(max(count, 1), dtype=np.uint64)
+        for offset in range(width):
+            hashes = hashes * _SHINGLE_BASE + codes[offset : offset + count]
+        return np.unique((hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF))
+
+    def signatures(self, texts: List[str]) -> np.ndarray:
+        """``(len(texts), num_perm)`` uint32 MinHash signatures."""
+        signatures = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            shingles = self._shingle_hashes(text)
+            hashed = self._multipliers[:, None] * shingles[None, :] + self._offsets[:, None]
+            signatures[i] = (hashed >> np.uint64(32)).min(axis=1)
+        return signatures
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows_per_band : (band + 1) * self.rows_per_band].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _similar(self, signature: np.ndarray, other: np.ndarray) -> bool:
+        return float(np.mean(signature == other)) >= self.threshold
+
+    def find(self, signatures: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Matches each signature against the remembered chunks and the
+        earlier signatures of the batch that were not duplicates themselves.
+
+        :return: ``(earlier, existing)``: per signature, the batch position
+            or the chunk id it duplicates, -1 where there is none
+        """
+        earlier = np.full(len(signatures), -1, dtype=np.int64)
+        existing = np.full(len(signatures), -1, dtype=np.int64)
+        batch_buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+        for i, signature in enumerate(signatures):
+            keys = self._band_keys(signature)
+            for band, key in enumerate(keys):
+                for position in self._buckets[band].get(key, ()):
+                    # Positions appended by newer copies are not ours.
+                    if position >= self._count or position in self._removed:
+                        continue
+                    if self._similar(signature, self._signatures[position]):
+                        existing[i] = self._ids[position]
+                        break
+                else:
+                    for position in batch_buckets[band].get(key, ()):
+                        if self._similar(signature, signatures[position]):
+                            earlier[i] = position
+                            break
+                if existing[i] >= 0 or earlier[i] >= 0:
+                    break
+            else:
+                for band, key in enumerate(keys):
+                    batch_buckets[band].setdefault(key, []).append(i)
+        return earlier, existing
+
+    def add(self, ids: np.ndarray, signatures: np.ndarray) -> None:
+        """
+        Remembers chunks that went into the database under ``ids``, which
+        are higher than any remembered id.
+        """
+        needed = self._count + len(signatures)
+        capacity = len(self._ids)
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity, 64)
+        if not self._owner:
+            self._rebuild(capacity)
+        elif capacity > len(self._ids):
+            # Bucket positions stay valid; older versions keep the old arrays.
+            old_signatures, old_ids = self._signatures, self._ids
+            self._signatures = np.empty((capacity, self.num_perm), dtype=np.uint32)
+            self._signatures[: self._count] = old_signatures[: self._count]
+            self._ids = np.empty(capacity, dtype=np.int64)
+            self._ids[: self._count] = old_ids[: self._count]
+        start, stop = self._count, self._count + len(signatures)
+        self._signatures[start:stop] = signatures
+        self._ids[start:stop] = ids
+        for position in range(start, stop):
+            self._index(position)
+        self._count = stop
+
+    def remove(self, ids: np.ndarray) -> None:
+        """Forgets deleted chunks; their bucket entries are skipped from now on."""
+        stored = self._ids[: self._count]
+        positions = np.searchsorted(stored, ids)
+        positions = positions[positions < self._count]
+        positions = positions[np.isin(stored[positions], ids)]
+        self._removed.update(positions.tolist())
+        if self._owner and len(self._removed) > self._count // 2:
+            self._rebuild(len(self._ids))
+
+    def record(
+        self, checked: int, duplicates: int, request_bytes: int, stored_bytes: int
+    ) -> None:
+        """Adds one build's outcome to the running totals reported by ``info``."""
+        self.checked += checked
+        self.duplicates += duplicates
+        self.request_bytes_saved += request_bytes
+        self.stored_bytes_saved += stored_bytes
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Chunks checked and found duplicate so far, and what that saved:
+        embedding calls, bytes of text not sent to the embedding API, and
+        bytes of vectors and text not stored (dropped chunks only).
+        """
+        return {
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "embeddings_saved": self.duplicates,
+            "request_bytes_saved": self.request_bytes_saved,
+            "stored_bytes_saved": self.stored_bytes_saved,
+            "threshold": self.threshold,
+            "action": self.action,
+        }
@@ -0,0 +1,84 @@
+import numpy as np
+from typing import Any, Dict
+from aimakerspace.indexes.base import CodeStoreIndex
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """Per-element set-bit counts; NumPy < 2.0 falls back to a byte table."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words)
+    return _POPCOUNT_TABLE[words.view(np.uint8)].reshape(*words.shape, -1).sum(-1)
+
+
+class BinaryIndex(CodeStoreIndex):
+    """
+    Sign-bit prefilter: each vector keeps one bit per dimension, 32x smaller
+    than float32, and candidates are ranked by Hamming distance to the
+    query's bits.
+
+    The ``rerank_k`` nearest by Hamming distance are re-scored with exact
+    cosine against the float vectors. With ``rerank_k=0`` the scores returned
+    are the angle estimate ``cos(pi * hamming / dim)``.
+    """
+
+    name = "binary"
+
+    def __init__(self, rerank_k: int = 200):
+        """
+        :param rerank_k: Hamming shortlist size re-scored exactly
+        """
+        self.rerank_k = rerank_k
+        self.dim = 0
+        self._clear()
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Sign bits need no training; this only clears the index."""
+        self.__init__(self.rerank_k)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """
+        Packs the sign bits of ``vectors`` into bytes, padded to whole 64-bit
+        words so Hamming distances can be computed a word at a time.
+        """
+        bits = np.packbits(np.asarray(vectors) > 0, axis=1)
+        padding = -bits.shape[1] % 8
+        return np.pad(bits, ((0, 0), (0, padding)))
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        if len(rows):
+            self.dim = vectors.shape[1]
+        super().add(vectors, rows)
+
+    def hamming_distances(self, query: np.ndarray) -> np.ndarray:
+        """Hamming distance of every stored row to the query's sign bits."""
+        query_words = self.encode(query[None, :]).view(np.uint64)
+        words = self._codes[: self._size].view(np.uint64)
+        return _popcount(words ^ query_words).sum(axis=1, dtype=np.int32)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        # Negated so that top_k picks the smallest distances.
+        return -self.hamming_distances(query).astype(np.float32)
+
+    def _estimates(self, scores: np.ndarray) -> np.ndarray:
+        return np.cos(np.pi * -scores / self.dim).astype(np.float32)
+
+    def params(self) -> Dict[str, Any]:
+        return {"rerank_k": self.rerank_k}
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"dim": np.array(self.dim), **super().state()}
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "BinaryIndex":
+        index = cls(**params)
+        index.dim = int(state["dim"])
+        index._restore(state)
+        return index
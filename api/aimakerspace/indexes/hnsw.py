@@ -0,0 +1,291 @@
+import heapq
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from aimakerspace.indexes.base import VectorIndex, renumbering, top_k
+
+
+class HNSWIndex(VectorIndex):
+    """
+    Hierarchical navigable small-world graph over the unit vectors.
+
+    Rows are inserted one at a time, so the graph grows incrementally as
+    documents are added and needs no training pass. Removed rows stay in the
+    graph as routing nodes but are never returned; searches widen their
+    candidate list past them, so they still return k rows when k are live.
+    """
+
+    name = "hnsw"
+    needs_training = False
+
+    def __init__(
+        self, M: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0
+    ):
+        """
+        :param M: Links per node on the upper layers; layer 0 keeps 2 * M
+        :param ef_construction: Candidate list size while inserting
+        :param ef_search: Candidate list size while searching; raise for recall
+        :param seed: Seed for the random layer assignment
+        """
+        self.M = M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._level_scale = 1.0 / np.log(max(M, 2))
+        self._levels = np.full(0, -1, dtype=np.int8)
+        self._deleted = np.zeros(0, dtype=bool)
+        self._links0 = np.full((0, 2 * M), -1, dtype=np.int32)
+        self._degree0 = np.zeros(0, dtype=np.int16)
+        self._upper: List[Dict[int, List[int]]] = []
+        self._entry_point = -1
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero((self._levels >= 0) & ~self._deleted))
+
+    def train(self, vectors: np.ndarray) -> None:
+        """HNSW needs no training; this only clears the graph."""
+        self.__init__(self.M, self.ef_construction, self.ef_search, self.seed)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._levels)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        grown = len(self._levels)
+        self._levels = np.concatenate(
+            [self._levels, np.full(capacity - grown, -1, dtype=np.int8)]
+        )
+        self._deleted = np.concatenate(
+            [self._deleted, np.zeros(capacity - grown, dtype=bool)]
+        )
+        self._links0 = np.vstack(
+            [self._links0, np.full((capacity - grown, 2 * self.M), -1, dtype=np.int32)]
+        )
+        self._degree0 = np.concatenate(
+            [self._degree0, np.zeros(capacity - grown, dtype=np.int16)]
+        )
+
+    def _neighbors(self, node: int, level: int) -> List[int]:
+        if level == 0:
+            return self._links0[node, : self._degree0[node]].tolist()
+        return self._upper[level - 1].get(node, [])
+
+    def _set_neighbors(self, node: int, level: int, neighbors: List[int]) -> None:
+        if level == 0:
+            self._links0[node, : len(neighbors)] = neighbors
+            self._links0[node, len(neighbors) :] = -1
+            self._degree0[node] = len(neighbors)
+        else:
+            self._upper[level - 1][node] = list(neighbors)
+
+    def _search_layer(
+        self,
+        query: np.ndarray,
+        entry_points: List[Tuple[float, int]],
+        ef: int,
+        level: int,
+        vectors: np.ndarray,
+    ) -> List[Tuple[float, int]]:
+        """Best-first search of one layer; returns up to ``ef`` (score, node)."""
+        visited = {node for _, node in entry_points}
+        candidates = [(-score, node) for score, node in entry_points]
+        heapq.heapify(candidates)
+        results = list(entry_points)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        while candidates:
+            negative_score, node = heapq.heappop(candidates)
+            if -negative_score < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in self._neighbors(node, level) if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            scores = (vectors[fresh] @ query).tolist()
+            for neighbor, score in zip(fresh, scores):
+                if len(results) < ef or score > results[0][0]:
+                    heapq.heappush(candidates, (-score, neighbor))
+                    heapq.heappush(results, (score, neighbor))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return results
+
+    def _select_neighbors(
+        self, candidates: List[Tuple[float, int]], limit: int, vectors: np.ndarray
+    ) -> List[int]:
+        """
+        Neighbour selection heuristic from the HNSW paper: keep a candidate
+        only if it is closer to the base node than to any already-kept one.
+        """
+        candidates = sorted(candidates, reverse=True)
+        if len(candidates) <= limit:
+            return [node for _, node in candidates]
+        nodes = [node for _, node in candidates]
+        pairwise = (vectors[nodes] @ vectors[nodes].T).tolist()
+        kept: List[int] = []
+        for i, (score, _) in enumerate(candidates):
+            if all(pairwise[i][j] < score for j in kept):
+                kept.append(i)
+                if len(kept) == limit:
+                    break
+        return [nodes[i] for i in kept]
+
+    def _insert(self, row: int, vectors: np.ndarray) -> None:
+        query = vectors[row]
+        level = self._levels[row]
+        if level < 0:
+            level = min(int(-np.log(1.0 - self._rng.random()) * self._level_scale), 15)
+            self._levels[row] = level
+        while len(self._upper) < level:
+            self._upper.append({})
+        if self._entry_point < 0:
+            self._entry_point = row
+            for layer in range(level + 1):
+                self._set_neighbors(row, layer, [])
+            return
+
+        entry = self._entry_point
+        top_level = int(self._levels[entry])
+        entry_points = [(float(vectors[entry] @ query), entry)]
+        for layer in range(top_level, level, -1):
+            entry_points = [max(self._search_layer(query, entry_points, 1, layer, vectors))]
+        for layer in range(min(level, top_level), -1, -1):
+            found = self._search_layer(
+                query, entry_points, self.ef_construction, layer, vectors
+            )
+            found = [(score, node) for score, node in found if node != row]
+            limit = 2 * self.M if layer == 0 else self.M
+            neighbors = self._select_neighbors(found, self.M, vectors)
+            self._set_neighbors(row, layer, neighbors)
+            for neighbor in neighbors:
+                links = self._neighbors(neighbor, layer)
+                if row in links:
+                    continue
+                links.append(row)
+                if len(links) > limit:
+                    scores = (vectors[links] @ vectors[neighbor]).tolist()
+                    links = self._select_neighbors(list(zip(scores, links)), limit, vectors)
+                self._set_neighbors(neighbor, layer, links)
+            entry_points = found or entry_points
+        for layer in range(top_level + 1, level + 1):
+            self._set_neighbors(row, layer, [])
+        if level > top_level:
+            self._entry_point = row
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        self._grow(int(rows.max()) + 1)
+        for row in rows.tolist():
+            self._deleted[row] = False
+            self._insert(row, vectors)
+
+    def remove(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        self._deleted[rows[rows < len(self._deleted)]] = True
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Drops removed nodes and the links pointing at them. Nodes that lose
+        many neighbours this way are not re-linked; call ``train`` and re-add
+        after heavy deletion to rebuild the graph.
+        """
+        new_rows = renumbering(keep, len(self._levels))
+        links = self._links0[keep].astype(np.int64)
+        links = np.where(links >= 0, new_rows[np.maximum(links, 0)], -1)
+        # Move surviving links to the front of each row.
+        order = np.argsort(links < 0, axis=1, kind="stable")
+        links = np.take_along_axis(links, order, axis=1)
+        self._links0 = links.astype(np.int32)
+        self._degree0 = np.count_nonzero(links >= 0, axis=1).astype(np.int16)
+        self._levels = self._levels[keep]
+        self._deleted = self._deleted[keep]
+        self._upper = [
+            {
+                int(new_rows[node]): [int(new_rows[n]) for n in neighbors if new_rows[n] >= 0]
+                for node, neighbors in layer.items()
+                if new_rows[node] >= 0
+            }
+            for layer in self._upper
+        ]
+        while self._upper and not self._upper[-1]:
+            self._upper.pop()
+        if self._entry_point >= 0 and new_rows[self._entry_point] >= 0:
+            self._entry_point = int(new_rows[self._entry_point])
+        else:
+            self._entry_point = int(np.argmax(self._levels)) if len(keep) else -1
+
+    def search(
+        self, query: np.ndarray, k: int, vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if self._entry_point < 0 or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        entry = self._entry_point
+        entry_points = [(float(vectors[entry] @ query), entry)]
+        for layer in range(int(self._levels[entry]), 0, -1):
+            entry_points = [max(self._search_layer(query, entry_points, 1, layer, vectors))]
+        # Removed nodes fill candidate slots without being returnable, so the
+        # candidate list widens until it holds k live nodes or every node.
+        ef = max(self.ef_search, k)
+        wanted = min(k, len(self))
+        while True:
+            found = self._search_layer(query, entry_points, ef, 0, vectors)
+            found = [(score, node) for score, node in found if not self._deleted[node]]
+            if len(found) >= wanted or ef >= len(self._levels):
+                break
+            ef *= 2
+        scores = np.array([score for score, _ in found], dtype=np.float32)
+        rows = np.array([node for _, node in found], dtype=np.int64)
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "M": self.M,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "seed": self.seed,
+        }
+
+    def state(self) -> Dict[str, np.ndarray]:
+        upper_nodes, upper_layers, upper_links = [], [], []
+        for layer, links in enumerate(self._upper, start=1):
+            for node, neighbors in links.items():
+                upper_nodes.append(node)
+                upper_layers.append(layer)
+                upper_links.append(neighbors + [-1] * (self.M - len(neighbors)))
+        return {
+            "levels": self._levels,
+            "deleted": self._deleted,
+            "links0": self._links0,
+            "degree0": self._degree0,
+            "upper_nodes": np.array(upper_nodes, dtype=np.int64),
+            "upper_layers": np.array(upper_layers, dtype=np.int64),
+            "upper_links": np.array(upper_links, dtype=np.int32).reshape(-1, self.M),
+            "entry_point": np.array(self._entry_point, dtype=np.int64),
+        }
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "HNSWIndex":
+        index = cls(**params)
+        index._levels = state["levels"]
+        index._deleted = state["deleted"]
+        index._links0 = state["links0"]
+        index._degree0 = state["degree0"]
+        index._entry_point = int(state["entry_point"])
+        index._upper = [{} for _ in range(int(index._levels.max(initial=0)))]
+        for node, layer, links in zip(
+            state["upper_nodes"].tolist(),
+            state["upper_layers"].tolist(),
+            state["upper_links"].tolist(),
+        ):
+            index._upper[layer - 1][node] = [n for n in links if n >= 0]
+        return index
@@ -0,0 +1,128 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from aimakerspace.indexes.base import VectorIndex, renumbering, top_k
+from aimakerspace.indexes.kmeans import assign, kmeans
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file index: k-means cells over the unit vectors, searched by
+    scoring only the rows in the ``nprobe`` cells closest to the query.
+
+    Raising ``nprobe`` trades latency for recall; ``nprobe == n_lists`` is an
+    exact search.
+    """
+
+    name = "ivf"
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        n_iter: int = 10,
+        max_train_points: int = 128,
+        seed: int = 0,
+    ):
+        """
+        :param n_lists: Number of k-means cells; defaults to sqrt(n) at train time
+        :param nprobe: Cells scored per query
+        :param n_iter: k-means iterations
+        :param max_train_points: Training sample size per cell
+        :param seed: Seed for the training sample and initialization
+        """
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[np.ndarray] = []
+        self._assignment = np.empty(0, dtype=np.int64)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        n_lists = self.n_lists or max(1, int(np.sqrt(len(vectors))))
+        sample_size = min(len(vectors), n_lists * self.max_train_points)
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        self.centroids = kmeans(
+            sample, n_lists, n_iter=self.n_iter, seed=self.seed, spherical=True
+        )
+        self._lists = [np.empty(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._assignment = np.empty(0, dtype=np.int64)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        labels, _ = assign(vectors[rows], self.centroids, spherical=True)
+        if rows.max() >= len(self._assignment):
+            grown = np.full(rows.max() + 1, -1, dtype=np.int64)
+            grown[: len(self._assignment)] = self._assignment
+            self._assignment = grown
+        self._assignment[rows] = labels
+        order = np.argsort(labels, kind="stable")
+        cells, starts = np.unique(labels[order], return_index=True)
+        for cell, members in zip(cells, np.split(rows[order], starts[1:])):
+            self._lists[cell] = np.concatenate([self._lists[cell], members])
+
+    def remove(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        rows = rows[rows < len(self._assignment)]
+        cells = self._assignment[rows]
+        for cell in np.unique(cells[cells >= 0]):
+            self._lists[cell] = self._lists[cell][
+                ~np.isin(self._lists[cell], rows[cells == cell])
+            ]
+        self._assignment[rows] = -1
+
+    def compact(self, keep: np.ndarray) -> None:
+        new_rows = renumbering(keep, len(self._assignment))
+        self._lists = [new_rows[members] for members in self._lists]
+        self._lists = [members[members >= 0] for members in self._lists]
+        self._assignment = self._assignment[keep]
+
+    def search(
+        self, query: np.ndarray, k: int, vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # Past the nprobe closest cells, further cells are probed in order
+        # until they hold k rows, so small or emptied cells don't cut the
+        # result short.
+        order = top_k(self.centroids @ query, len(self.centroids))
+        sizes = np.cumsum([len(self._lists[cell]) for cell in order])
+        probes = max(self.nprobe, int(np.searchsorted(sizes, k)) + 1)
+        rows = np.concatenate([self._lists[cell] for cell in order[:probes]])
+        scores = vectors[rows] @ query
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "n_lists": self.n_lists,
+            "nprobe": self.nprobe,
+            "n_iter": self.n_iter,
+            "max_train_points": self.max_train_points,
+            "seed": self.seed,
+        }
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"centroids": self.centroids, "assignment": self._assignment}
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "IVFIndex":
+        index = cls(**params)
+        index.centroids = state["centroids"]
+        index._assignment = np.array(state["assignment"], dtype=np.int64)
+        index._lists = [np.empty(0, dtype=np.int64) for _ in range(len(index.centroids))]
+        live = np.flatnonzero(index._assignment >= 0)
+        labels = index._assignment[live]
+        order = np.argsort(labels, kind="stable")
+        cells, starts = np.unique(labels[order], return_index=True)
+        for cell, members in zip(cells, np.split(live[order], starts[1:])):
+            index._lists[cell] = members
+        return index
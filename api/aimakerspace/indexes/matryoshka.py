@@ -0,0 +1,55 @@
+import numpy as np
+from typing import Any, Dict
+from aimakerspace.indexes.base import CodeStoreIndex, normalize
+
+
+class MatryoshkaIndex(CodeStoreIndex):
+    """
+    Two-stage search for Matryoshka embeddings such as text-embedding-3: a
+    coarse scan over the first ``dims`` dimensions, re-normalized, followed
+    by an exact full-width re-score of the best ``rerank_k`` rows.
+
+    The prefix matrix is ``dims / dim`` the size of the full one, so the scan
+    touches that much less memory.
+    """
+
+    name = "matryoshka"
+    code_dtype = np.float32
+    _codes_key = "prefixes"
+
+    def __init__(self, dims: int = 256, rerank_k: int = 100):
+        """
+        :param dims: Leading dimensions used by the coarse scan
+        :param rerank_k: Coarse shortlist size re-scored at full width; 0
+            returns the prefix scores as they are
+        """
+        self.dims = dims
+        self.rerank_k = rerank_k
+        self._clear((0, dims))
+
+    @property
+    def is_trained(self) -> bool:
+        return True
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Truncation needs no training; this only clears the index."""
+        self.__init__(self.dims, self.rerank_k)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Re-normalized leading ``dims`` dimensions of ``vectors``."""
+        return normalize(vectors[:, : self.dims])[0]
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        prefix, _ = normalize(query[: self.dims])
+        return self._codes[: self._size] @ prefix[0]
+
+    def params(self) -> Dict[str, Any]:
+        return {"dims": self.dims, "rerank_k": self.rerank_k}
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "MatryoshkaIndex":
+        index = cls(**params)
+        index._restore(state)
+        return index
@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Any, Dict, Optional
+from aimakerspace.indexes.base import CodeStoreIndex, scan_scores
+
+
+class ScalarQuantizedIndex(CodeStoreIndex):
+    """
+    int8 scalar quantization: every dimension of the unit vectors is scaled
+    by its own factor into [-127, 127], a quarter of the float32 footprint.
+
+    Queries scan the int8 codes for a ``rerank_k`` shortlist that is then
+    re-scored exactly against the float vectors, which only touches those
+    rows when the database was loaded with ``mmap=True``.
+    """
+
+    name = "sq8"
+    code_dtype = np.int8
+
+    def __init__(
+        self, rerank_k: int = 100, max_train_points: int = 65536, seed: int = 0
+    ):
+        """
+        :param rerank_k: Shortlist size re-scored exactly; 0 returns the
+            approximate scores as they are
+        :param max_train_points: Sample size used to fit the per-dimension scales
+        :param seed: Seed for the training sample
+        """
+        self.rerank_k = rerank_k
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.scales: Optional[np.ndarray] = None
+        self._clear()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scales is not None
+
+    def train(self, vectors: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), self.max_train_points)
+        sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))]
+        peaks = np.abs(np.asarray(sample, dtype=np.float32)).max(axis=0)
+        self.scales = (np.where(peaks == 0, 1.0, peaks) / 127.0).astype(np.float32)
+        self._clear((0, vectors.shape[1]))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Returns ``(n, dim)`` int8 codes; values past the trained range clip."""
+        scaled = np.rint(np.asarray(vectors, dtype=np.float32) / self.scales)
+        return np.clip(scaled, -127, 127).astype(np.int8)
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """int8 scan scores of every stored row."""
+        return scan_scores(self._codes[: self._size], query * self.scales)
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "rerank_k": self.rerank_k,
+            "max_train_points": self.max_train_points,
+            "seed": self.seed,
+        }
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"scales": self.scales, **super().state()}
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "ScalarQuantizedIndex":
+        index = cls(**params)
+        index.scales = state["scales"]
+        index._restore(state)
+        return index
@@ -0,0 +1,147 @@
+import sys
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Union
+
+# A filter maps column names to a value, a collection of accepted values, or a
+# predicate called once per distinct value in the column.
+Filter = Dict[str, Union[Any, List[Any], Callable[[Any], bool]]]
+
+
+class _Column:
+    """Dictionary-encoded column: distinct values plus one int32 code per row."""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self.lookup: Dict[Any, int] = {}
+        self.codes = np.full(0, -1, dtype=np.int32)
+
+    def code(self, value: Any) -> int:
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def matching_codes(self, condition: Any) -> np.ndarray:
+        if callable(condition):
+            codes = [code for code, value in enumerate(self.values) if condition(value)]
+        elif isinstance(condition, (list, tuple, set, frozenset)):
+            codes = [self.lookup[value] for value in condition if value in self.lookup]
+        else:
+            codes = [self.lookup[condition]] if condition in self.lookup else []
+        return np.array(codes, dtype=np.int32)
+
+
+class MetadataStore:
+    """
+    Per-row metadata kept as dictionary-encoded columns.
+
+    Every column stores its distinct values once and an int32 code per row,
+    so a filter is resolved against the (small) set of distinct values and
+    then turned into a row mask with one vectorized comparison, without
+    touching a Python object per row.
+    """
+
+    def __init__(self):
+        self._columns: Dict[str, _Column] = {}
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the per-row codes plus the (shallow) size of the distinct values."""
+        return sum(
+            column.codes.nbytes + sum(sys.getsizeof(value) for value in column.values)
+            for column in self._columns.values()
+        )
+
+    def _grow(self, column: _Column, size: int) -> None:
+        capacity = len(column.codes)
+        if size <= capacity:
+            return
+        codes = np.full(max(size, 2 * capacity, 64), -1, dtype=np.int32)
+        codes[:capacity] = column.codes
+        column.codes = codes
+
+    def set(self, rows: List[int], metadata: List[Optional[Dict[str, Any]]]) -> None:
+        """Sets the given columns of ``rows``; other columns keep their values."""
+        for row, fields in zip(rows, metadata):
+            for name, value in (fields or {}).items():
+                column = self._columns.get(name)
+                if column is None:
+                    column = self._columns[name] = _Column()
+                self._grow(column, row + 1)
+                column.codes[row] = -1 if value is None else column.code(value)
+
+    def clear(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        for column in self._columns.values():
+            column.codes[rows[rows < len(column.codes)]] = -1
+
+    def get(self, row: int) -> Dict[str, Any]:
+        fields = {}
+        for name, column in self._columns.items():
+            if row < len(column.codes) and column.codes[row] >= 0:
+                fields[name] = column.values[column.codes[row]]
+        return fields
+
+    def mask(self, filter: Filter, size: int) -> np.ndarray:
+        """
+        Boolean mask over the first ``size`` rows matching every condition.
+
+        :param filter: Column name to accepted value, list of values, or
+            predicate on the value; rows without the column never match
+        :param size: Number of rows to cover
+        """
+        mask = np.ones(size, dtype=bool)
+        for name, condition in filter.items():
+            column = self._columns.get(name)
+            if column is None:
+                return np.zeros(size, dtype=bool)
+            codes = column.codes[:size]
+            matching = column.matching_codes(condition)
+            selected = np.zeros(size, dtype=bool)
+            if len(matching) == 1:
+                selected[: len(codes)] = codes == matching[0]
+            elif len(matching):
+                selected[: len(codes)] = np.isin(codes, matching)
+            mask &= selected
+        return mask
+
+    def copy(self) -> "MetadataStore":
+        """An independent copy; the per-row codes are duplicated."""
+        store = MetadataStore()
+        for name, column in self._columns.items():
+            copied = store._columns[name] = _Column()
+            copied.values = list(column.values)
+            copied.lookup = dict(column.lookup)
+            copied.codes = column.codes.copy()
+        return store
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Keeps only rows ``keep``, renumbered in order, like the vectors."""
+        for column in self._columns.values():
+            self._grow(column, int(keep.max(initial=-1)) + 1)
+            column.codes = column.codes[keep]
+
+    def state(self, size: int) -> Dict[str, Dict[str, list]]:
+        """JSON-serializable columns for the first ``size`` rows."""
+        state = {}
+        for name, column in self._columns.items():
+            codes = np.full(size, -1, dtype=np.int32)
+            stored = column.codes[:size]
+            codes[: len(stored)] = stored
+            state[name] = {"values": column.values, "codes": codes.tolist()}
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Dict[str, list]]) -> "MetadataStore":
+        store = cls()
+        for name, saved in state.items():
+            column = store._columns[name] = _Column()
+            column.values = list(saved["values"])
+            column.lookup = {value: code for code, value in enumerate(column.values)}
+            column.codes = np.array(saved["codes"], dtype=np.int32)
+        return store
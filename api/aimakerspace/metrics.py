@@ -0,0 +1,129 @@
+import numpy as np
+from typing import Callable, Dict, NamedTuple, Union
+from aimakerspace.indexes.base import scan_scores
+
+# A batch kernel scores every row of a matrix against every query at once:
+# kernel(queries, query_norms, matrix, norms) -> (len(queries), len(matrix))
+# scores, where ``queries`` and ``matrix`` hold unit rows (the matrix in its
+# storage dtype) and the norms give back the original lengths. The built-in
+# kernels are one scan_scores product plus elementwise work, so searching
+# costs the same whichever of them is selected.
+Kernel = Callable[[np.ndarray, np.ndarray, np.ndarray, np.ndarray], np.ndarray]
+
+
+class Metric(NamedTuple):
+    name: str
+    kernel: Kernel
+    # Rank high scores first (similarities) or low ones first (distances).
+    higher_is_better: bool = True
+    # False for legacy per-pair callables wrapped by get_metric.
+    vectorized: bool = True
+
+    @property
+    def is_cosine(self) -> bool:
+        """Whether searches can take the cosine fast paths (indexes, MMR, ...)."""
+        return self.kernel is cosine_scores
+
+
+def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
+    """Computes the cosine similarity between two vectors."""
+    dot_product = np.dot(vector_a, vector_b)
+    norm_a = np.linalg.norm(vector_a)
+    norm_b = np.linalg.norm(vector_b)
+    return dot_product / (norm_a * norm_b)
+
+
+def cosine_scores(queries, query_norms, matrix, norms) -> np.ndarray:
+    return scan_scores(matrix, queries)
+
+
+def dot_scores(queries, query_norms, matrix, norms) -> np.ndarray:
+    scores = scan_scores(matrix, queries)
+    scores *= query_norms[:, None]
+    scores *= norms[None, :]
+    return scores
+
+
+def negative_l2_scores(queries, query_norms, matrix, norms) -> np.ndarray:
+    """Negated squared Euclidean distances, from |q|² + |x|² - 2 q·x."""
+    scores = dot_scores(queries, query_norms, matrix, norms)
+    scores *= 2
+    scores -= (query_norms**2)[:, None]
+    scores -= (norms**2)[None, :]
+    return np.minimum(scores, 0, out=scores)
+
+
+def euclidean_distances(queries, query_norms, matrix, norms) -> np.ndarray:
+    distances = negative_l2_scores(queries, query_norms, matrix, norms)
+    np.subtract(0, distances, out=distances)  # 0 - x, so exact matches get +0.0
+    return np.sqrt(distances, out=distances)
+
+
+# Metrics by name, as accepted by the ``distance_measure`` argument of the
+# VectorDatabase searches; extended with register_metric.
+METRICS: Dict[str, Metric] = {
+    metric.name: metric
+    for metric in (
+        Metric("cosine", cosine_scores),
+        Metric("dot", dot_scores),
+        Metric("euclidean", euclidean_distances, higher_is_better=False),
+        Metric("negative_l2", negative_l2_scores),
+    )
+}
+
+
+def register_metric(name: str, kernel: Kernel, higher_is_better: bool = True) -> Metric:
+    """
+    Adds a batch kernel (see ``Kernel``) to ``METRICS`` so searches can
+    select it by name or by passing the kernel itself.
+    """
+    if name in METRICS:
+        raise ValueError(f"Metric {name!r} is already registered")
+    metric = METRICS[name] = Metric(name, kernel, higher_is_better)
+    return metric
+
+
+def _scalar_kernel(function: Callable[[np.ndarray, np.ndarray], float]) -> Kernel:
+    """Calls a legacy ``function(query_vector, stored_vector)`` once per pair."""
+
+    def kernel(queries, query_norms, matrix, norms) -> np.ndarray:
+        vectors = np.asarray(matrix, dtype=np.float32) * norms[:, None]
+        return np.array(
+            [
+                [function(query, vector) for vector in vectors]
+                for query in queries * query_norms[:, None]
+            ],
+            dtype=np.float32,
+        ).reshape(len(queries), len(vectors))
+
+    return kernel
+
+
+def get_metric(distance_measure: Union[str, Callable, Metric]) -> Metric:
+    """
+    Resolves a search's ``distance_measure``: a metric name, a ``Metric``,
+    a registered kernel, or ``cosine_similarity``.
+
+    Any other callable is taken for a legacy scalar function of two vectors,
+    higher meaning more similar, and is called once per stored vector.
+    """
+    if isinstance(distance_measure, Metric):
+        return distance_measure
+    if isinstance(distance_measure, str):
+        metric = METRICS.get(distance_measure)
+        if metric is None:
+            raise ValueError(
+                f"Unknown metric {distance_measure!r}; expected one of {tuple(METRICS)}"
+            )
+        return metric
+    if distance_measure is cosine_similarity:
+        return METRICS["cosine"]
+    for metric in METRICS.values():
+        if metric.kernel is distance_measure:
+            return metric
+    if not callable(distance_measure):
+        raise ValueError(
+            f"distance_measure must be a metric name or callable, not {distance_measure!r}"
+        )
+    name = getattr(distance_measure, "__name__", "custom")
+    return Metric(name, _scalar_kernel(distance_measure), vectorized=False)
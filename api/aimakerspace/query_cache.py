@@ -0,0 +1,77 @@
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings with an optional time to live.
+
+    Entries are read-only float32 arrays. Access is locked, so the cache can
+    be shared between the event loop and worker threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param maxsize: Entries kept before the least recently used is evicted
+        :param ttl: Seconds an entry stays valid; None keeps it until evicted
+        :param clock: Time source, in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None:
+                if self._clock() - entry[0] > self.ttl:
+                    del self._entries[key]
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, embedding: Any) -> np.ndarray:
+        """Stores ``embedding`` and returns it as the cached array."""
+        embedding = np.array(embedding, dtype=np.float32)
+        embedding.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (self._clock(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return embedding
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> Dict[str, Any]:
+        """Hit and miss counts, current size and limits."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,104 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Upper bounds, in milliseconds, of the latency histogram buckets; one more
+# bucket takes everything slower.
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+class _KindStats:
+    def __init__(self):
+        self.calls = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def quantile_ms(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding quantile ``q``; None past the last."""
+        rank = q * self.calls
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.histogram):
+            seen += count
+            if seen >= rank:
+                return bound
+        return None
+
+
+class SearchStats:
+    """
+    Cumulative call counts and latency histograms, per kind of search.
+
+    Only the outermost timed call on a thread is recorded, so a search that
+    delegates to another (``search`` to ``search_many`` for non-cosine
+    metrics, ...) counts once. Updates are locked like ``EmbeddingCache``,
+    since searches also run in worker threads.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        """
+        :param clock: Time source, in seconds
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._kinds: Dict[str, _KindStats] = {}
+
+    @contextmanager
+    def timed(self, kind: str, queries: int = 1) -> Iterator[None]:
+        """
+        Records the duration of the ``with`` block as one ``kind`` call,
+        unless it raises.
+        """
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+        if depth == 0:
+            self.record(kind, self._clock() - start, queries)
+
+    def record(self, kind: str, seconds: float, queries: int = 1) -> None:
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)
+        with self._lock:
+            stats = self._kinds.get(kind)
+            if stats is None:
+                stats = self._kinds[kind] = _KindStats()
+            stats.calls += 1
+            stats.queries += queries
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.histogram[bucket] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._kinds.clear()
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Per kind: calls, queries (batches count each query), mean and max
+        latency, p50/p99 as histogram bucket bounds, and the histogram
+        counts for ``buckets_ms`` (the last count is for slower calls).
+        """
+        with self._lock:
+            kinds: Dict[str, Dict[str, Any]] = {}
+            for kind, stats in self._kinds.items():
+                kinds[kind] = {
+                    "calls": stats.calls,
+                    "queries": stats.queries,
+                    "mean_ms": 1000 * stats.seconds / stats.calls,
+                    "max_ms": 1000 * stats.max_seconds,
+                    "p50_ms": stats.quantile_ms(0.5),
+                    "p99_ms": stats.quantile_ms(0.99),
+                    "histogram": list(stats.histogram),
+                }
+            return {
+                "calls": sum(stats["calls"] for stats in kinds.values()),
+                "buckets_ms": list(LATENCY_BUCKETS_MS),
+                "by_kind": kinds,
+            }
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import numpy as np
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple, Union
+from aimakerspace.indexes.base import normalize, scan_scores, top_k
+from aimakerspace.metadata import Filter
+from aimakerspace.metrics import get_metric
+from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace.vectordatabase import (
+    _SCORE_BLOCK_ELEMENTS,
+    _VECTORS_FILE,
+    VectorDatabase,
+)
+
+# The memory-mapped vectors of the index served by this worker process.
+_worker_matrix: Optional[np.ndarray] = None
+
+
+def _open_matrix(vectors_path: str) -> None:
+    global _worker_matrix
+    _worker_matrix = np.load(vectors_path, mmap_mode="r")
+
+
+def _search_shard(
+    start: int, stop: int, queries: np.ndarray, k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-query top-k ``(rows, scores)`` of rows ``start:stop``, as (n, k) arrays."""
+    shard = _worker_matrix[start:stop]
+    k = min(k, stop - start)
+    rows = np.empty((len(queries), k), dtype=np.int64)
+    scores = np.empty((len(queries), k), dtype=np.float32)
+    block = max(1, _SCORE_BLOCK_ELEMENTS // max(stop - start, 1))
+    for first in range(0, len(queries), block):
+        block_scores = scan_scores(shard, queries[first : first + block])
+        for i, row_scores in enumerate(block_scores, start=first):
+            best = top_k(row_scores, k)
+            rows[i], scores[i] = best + start, row_scores[best]
+    return rows, scores
+
+
+class ShardedVectorDatabase:
+    """
+    Exact search over an index written by ``VectorDatabase.save``, split into
+    row-range shards that a pool of worker processes scores in parallel.
+
+    Every worker memory-maps the same vectors file, so shards share the OS
+    page cache and a query only ships the query vectors out and each
+    shard's top-k back. The parent merges the shard results and holds the
+    chunk text and metadata. The shards are read-only: write through a
+    ``VectorDatabase``, save it and open a new ``ShardedVectorDatabase``.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        n_shards: Optional[int] = None,
+        embedding_model: EmbeddingModel = None,
+    ):
+        """
+        :param path: Directory holding an index saved by ``VectorDatabase.save``
+        :param n_shards: Shards and worker processes; defaults to the CPU count
+        :param embedding_model: Model for text queries; must match the index
+        """
+        self.db = VectorDatabase.load(path, embedding_model=embedding_model)
+        self.n_shards = n_shards or os.cpu_count() or 1
+        bounds = np.linspace(0, len(self.db), self.n_shards + 1).astype(int).tolist()
+        self._shards = [
+            (start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+        ]
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.n_shards,
+            initializer=_open_matrix,
+            initargs=(os.path.join(path, _VECTORS_FILE),),
+        )
+
+    def __len__(self) -> int:
+        return len(self.db)
+
+    def close(self) -> None:
+        """Shuts the worker processes down."""
+        self._pool.shutdown()
+
+    def __enter__(self) -> "ShardedVectorDatabase":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _scatter(self, queries: np.ndarray, k: int) -> List[Future]:
+        return [
+            self._pool.submit(_search_shard, start, stop, queries, k)
+            for start, stop in self._shards
+        ]
+
+    def _gather(
+        self, parts: List[Tuple[np.ndarray, np.ndarray]], k: int, with_metadata: bool = False
+    ) -> List[List[Tuple[str, float]]]:
+        """Merges per-shard top-k lists into the overall top-k of each query."""
+        rows = np.concatenate([part[0] for part in parts], axis=1)
+        scores = np.concatenate([part[1] for part in parts], axis=1)
+        results = []
+        for query_rows, query_scores in zip(rows, scores):
+            best = top_k(query_scores, k)
+            results.append(self.db._results(query_rows[best], query_scores[best], with_metadata))
+        return results
+
+    def _sharded(
+        self,
+        distance_measure: Union[str, Callable],
+        filter: Optional[Filter],
+        mmr: bool = False,
+    ) -> bool:
+        """Whether the worker shards can serve a search; see ``search``."""
+        return not filter and not mmr and get_metric(distance_measure).is_cosine
+
+    def search(
+        self,
+        query_vector: np.array,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        filter: Optional[Filter] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """
+        Same results as ``VectorDatabase.search``. Filtered searches only
+        score the matching rows, MMR compares candidates with each other and
+        metrics other than cosine are scored by the database's own kernels,
+        so those run in the parent process.
+        """
+        if mmr:
+            return self.db.search(
+                query_vector, k, distance_measure, filter, mmr, fetch_k, lambda_, with_metadata
+            )
+        return self.search_many([query_vector], k, distance_measure, filter, with_metadata)[0]
+
+    def search_range(
+        self,
+        query_vector: np.array,
+        min_score: float,
+        max_results: Optional[int] = None,
+        filter: Optional[Filter] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Same as ``VectorDatabase.search_range``, run in the parent process:
+        thresholding is a single pass that ranks nothing when no row clears
+        ``min_score``, which leaves little for the shards to split.
+        """
+        return self.db.search_range(query_vector, min_score, max_results, filter)
+
+    def search_many(
+        self,
+        query_vectors: np.array,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        if not self._sharded(distance_measure, filter):
+            return self.db.search_many(
+                query_vectors, k, distance_measure, filter, with_metadata
+            )
+        queries, _ = normalize(query_vectors)
+        if not self._shards:
+            return [[] for _ in range(len(queries))]
+        return self._gather(
+            [future.result() for future in self._scatter(queries, k)], k, with_metadata
+        )
+
+    def search_by_text(
+        self,
+        query_text: str,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        mode: str = "vector",
+        min_score: Optional[float] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """
+        Same as ``VectorDatabase.search_by_text``; lexical and hybrid modes
+        and ``min_score`` thresholds run in the parent process.
+        """
+        if mode != "vector" or min_score is not None or not self._sharded(
+            distance_measure, filter, mmr
+        ):
+            return self.db.search_by_text(
+                query_text,
+                k,
+                distance_measure=distance_measure,
+                return_as_text=return_as_text,
+                filter=filter,
+                mode=mode,
+                min_score=min_score,
+                mmr=mmr,
+                fetch_k=fetch_k,
+                lambda_=lambda_,
+                with_metadata=with_metadata,
+            )
+        results = self.search(
+            self.db._embed_query(query_text), k, with_metadata=with_metadata
+        )
+        return [result[0] for result in results] if return_as_text else results
+
+    async def asearch_by_text(
+        self,
+        query_text: str,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        mode: str = "vector",
+        min_score: Optional[float] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """``search_by_text`` that awaits both the embedding and the shards."""
+        if mode != "vector" or min_score is not None or not self._sharded(
+            distance_measure, filter, mmr
+        ):
+            return await self.db.asearch_by_text(
+                query_text,
+                k,
+                distance_measure=distance_measure,
+                return_as_text=return_as_text,
+                filter=filter,
+                mode=mode,
+                min_score=min_score,
+                mmr=mmr,
+                fetch_k=fetch_k,
+                lambda_=lambda_,
+                with_metadata=with_metadata,
+            )
+        query_vector = await self.db._aembed_query(query_text)
+        if not self._shards:
+            return []
+        queries, _ = normalize(query_vector)
+        parts = await asyncio.gather(
+            *[asyncio.wrap_future(future) for future in self._scatter(queries, k)]
+        )
+        results = self._gather(list(parts), k, with_metadata)[0]
+        return [result[0] for result in results] if return_as_text else results
+
+    def search_by_texts(
+        self,
+        query_texts: List[str],
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """Embeds the queries in one batch and scatters them together."""
+        if not query_texts:
+            return []
+        batches = self.search_many(
+            self.db._embed_queries(query_texts), k, distance_measure, filter, with_metadata
+        )
+        if return_as_text:
+            return [[result[0] for result in results] for results in batches]
+        return batches
+
+    async def asearch_by_texts(
+        self,
+        query_texts: List[str],
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """``search_by_texts`` that awaits both the embeddings and the shards."""
+        if not self._sharded(distance_measure, filter):
+            return await self.db.asearch_by_texts(
+                query_texts, k, distance_measure, return_as_text, filter, with_metadata
+            )
+        if not query_texts or not self._shards:
+            return [[] for _ in query_texts]
+        queries, _ = normalize(await self.db._aembed_queries(query_texts))
+        parts = await asyncio.gather(
+            *[asyncio.wrap_future(future) for future in self._scatter(queries, k)]
+        )
+        batches = self._gather(list(parts), k, with_metadata)
+        if return_as_text:
+            return [[result[0] for result in results] for results in batches]
+        return batches
@@ -0,0 +1,54 @@
+import hashlib
+import numpy as np
+import pytest
+from typing import List
+
+
+class FakeEmbeddingModel:
+    """
+    In-process stand-in for ``EmbeddingModel``: every text maps to a fixed
+    pseudo-random vector seeded by its hash, and requests are counted.
+    """
+
+    def __init__(self, dim: int = 16, embeddings_model_name: str = "fake-embedding"):
+        self.dim = dim
+        self.embeddings_model_name = embeddings_model_name
+        self.dimensions = None
+        self.requests = 0
+        self.texts_embedded = 0
+
+    def vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        return np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+
+    def get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
+        self.requests += 1
+        self.texts_embedded += len(list_of_text)
+        return [self.vector(text).tolist() for text in list_of_text]
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self.get_embeddings([text])[0]
+
+    async def async_get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
+        return self.get_embeddings(list_of_text)
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return self.get_embedding(text)
+
+
+@pytest.fixture
+def embedding_model() -> FakeEmbeddingModel:
+    return FakeEmbeddingModel()
+
+
+@pytest.fixture
+def clustered():
+    """``clustered(n, dim)``: float32 vectors around a few centers, seeded."""
+
+    def make(n: int, dim: int = 16, centers: int = 8, seed: int = 0) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        means = rng.standard_normal((centers, dim))
+        labels = rng.integers(0, centers, n)
+        return (means[labels] + 0.3 * rng.standard_normal((n, dim))).astype(np.float32)
+
+    return make
@@ -0,0 +1,60 @@
+import pytest
+from aimakerspace.vectordatabase import VectorDatabase
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def db(embedding_model, clustered):
+    db = VectorDatabase(embedding_model, compaction_threshold=1.0)
+    db.add(
+        [f"chunk {i}" for i in range(120)],
+        clustered(120),
+        [{"document": f"d{i % 4}", "page": i // 10} for i in range(120)],
+    )
+    db.delete_ids([3, 4, 5])
+    return db
+
+
+@pytest.mark.parametrize("name", ["db.arrow", "db.parquet"])
+def test_round_trip(embedding_model, clustered, db, tmp_path, name):
+    path = str(tmp_path / name)
+    db.export_arrow(path, batch_size=50)
+    imported = VectorDatabase.import_arrow(path, embedding_model)
+    assert len(imported) == len(db) == 117
+    for query in clustered(3, seed=1):
+        assert imported.search(query, 5, with_metadata=True) == db.search(
+            query, 5, with_metadata=True
+        )
+    assert imported.add(["new"], clustered(1, seed=2)).tolist() == [120]
+
+
+def test_ipc_import_is_memory_mapped(embedding_model, db, tmp_path):
+    db.export_arrow(str(tmp_path / "one.arrow"))
+    assert VectorDatabase.import_arrow(str(tmp_path / "one.arrow"), embedding_model).stats()[
+        "memory_mapped"
+    ]
+    db.export_arrow(str(tmp_path / "many.arrow"), batch_size=50)
+    assert not VectorDatabase.import_arrow(str(tmp_path / "many.arrow"), embedding_model).stats()[
+        "memory_mapped"
+    ]
+
+
+def test_export_over_an_imported_file(embedding_model, clustered, db, tmp_path):
+    path = str(tmp_path / "db.arrow")
+    db.export_arrow(path)
+    imported = VectorDatabase.import_arrow(path, embedding_model)
+    query = clustered(1, seed=1)[0]
+    before = imported.search(query, 5)
+    db.delete_ids(list(range(60)))
+    db.export_arrow(path)
+    assert imported.search(query, 5) == before
+    assert len(VectorDatabase.import_arrow(path, embedding_model)) == 60
+
+
+def test_export_of_a_database_without_vectors(embedding_model, db, tmp_path):
+    with pytest.raises(ValueError, match="vector width"):
+        VectorDatabase(embedding_model).export_arrow(str(tmp_path / "empty.arrow"))
+    db.delete_ids(list(range(120)))
+    db.export_arrow(str(tmp_path / "emptied.arrow"))
+    assert len(VectorDatabase.import_arrow(str(tmp_path / "emptied.arrow"), embedding_model)) == 0
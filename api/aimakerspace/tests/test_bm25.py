@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from aimakerspace.bm25 import BM25Index, tokenize
+from aimakerspace.vectordatabase import VectorDatabase
+
+TEXTS = [
+    "Use itertools.groupby to group sorted items",
+    "groupby needs sorted input",
+    "The os.path module joins paths",
+    "Lists are mutable; tuples are not",
+    "Sorting a list in place with list.sort",
+]
+
+
+def test_tokenize_keeps_dotted_names_and_their_parts():
+    assert tokenize("Call os.path.join, then RETURN!") == [
+        "call", "os.path.join", "os", "path", "join", "then", "return"
+    ]
+    assert tokenize("") == []
+
+
+def test_scores_rank_rare_and_repeated_terms_higher():
+    index = BM25Index()
+    index.add(TEXTS)
+    scores = index.scores("itertools.groupby")
+    # Only the rows sharing a term score, and the qualified name beats the bare one.
+    assert np.flatnonzero(scores).tolist() == [0, 1]
+    assert scores[0] > scores[1]
+    assert not index.scores("unknown words").any()
+    index.compact(np.array([1, 2, 3, 4]))
+    assert np.flatnonzero(index.scores("groupby")).tolist() == [0]
+
+
+def test_hybrid_fuses_both_rankings_by_reciprocal_rank(embedding_model):
+    db = VectorDatabase(embedding_model)
+    db.add(TEXTS, np.stack([embedding_model.vector(text) for text in TEXTS]))
+    query = "sorted list groupby"
+    vector = [text for text, _ in db.search_by_text(query, 50)]
+    lexical = [text for text, _ in db.search_by_text(query, 50, mode="lexical")]
+    assert lexical and set(lexical) < set(vector)
+    # Each ranking adds 1 / (60 + rank), ranks counting from 1.
+    fused = {
+        text: sum(
+            1 / (61 + ranking.index(text)) for ranking in (vector, lexical) if text in ranking
+        )
+        for text in TEXTS
+    }
+    expected = sorted(TEXTS, key=lambda text: -fused[text])[:3]
+    results = db.search_by_text(query, 3, mode="hybrid")
+    assert [text for text, _ in results] == expected
+    assert [score for _, score in results] == pytest.approx([fused[text] for text in expected])
@@ -0,0 +1,67 @@
+import asyncio
+import numpy as np
+from aimakerspace.dedup import MinHashDeduplicator
+from aimakerspace.vectordatabase import VectorDatabase
+
+PARAGRAPH = (
+    "The quick brown fox jumps over the lazy dog while the farmer watches "
+    "from the porch, sipping coffee and counting the clouds drifting by."
+)
+
+
+def unique_texts(n):
+    rng = np.random.default_rng(0)
+    words = [f"word{i}" for i in range(500)]
+    return [" ".join(rng.choice(words, 40)) for _ in range(n)]
+
+
+def test_near_duplicates_are_not_embedded(embedding_model):
+    db = VectorDatabase(embedding_model, deduplicator=MinHashDeduplicator())
+    texts = [PARAGRAPH, PARAGRAPH.replace("coffee", "tea"), "Something else entirely."]
+    asyncio.run(db.abuild_from_list(texts))
+    assert embedding_model.texts_embedded == 2
+    assert len(db) == 2
+    asyncio.run(db.abuild_from_list([PARAGRAPH.upper()]))
+    assert embedding_model.texts_embedded == 2
+    assert db.deduplicator.info()["duplicates"] == 2
+
+
+def test_reused_duplicates_keep_their_own_metadata(embedding_model):
+    db = VectorDatabase(embedding_model, deduplicator=MinHashDeduplicator(action="reuse"))
+    asyncio.run(db.abuild_from_list([PARAGRAPH], [{"document": "a"}]))
+    asyncio.run(db.abuild_from_list([PARAGRAPH + " "], [{"document": "b"}]))
+    assert len(db) == 2
+    results = db.search(embedding_model.vector(PARAGRAPH), 2, with_metadata=True)
+    assert sorted(metadata["document"] for _, _, metadata in results) == ["a", "b"]
+
+
+def test_copies_share_state_but_not_changes():
+    dedup = MinHashDeduplicator()
+    texts = unique_texts(200)
+    signatures = dedup.signatures(texts)
+    dedup.add(np.arange(200), signatures)
+    copy = dedup.copy()
+    copy.remove(np.array([0, 1]))
+    new = dedup.signatures(["a brand new chunk of text " * 4])
+    copy.add(np.array([200]), new)
+    assert copy.find(signatures[:3])[1].tolist() == [-1, -1, 2]
+    assert copy.find(new)[1].tolist() == [200]
+    # The original sees neither the removal nor the addition ...
+    assert dedup.find(signatures[:3])[1].tolist() == [0, 1, 2]
+    assert dedup.find(new)[1].tolist() == [-1]
+    assert (len(dedup), len(copy)) == (200, 199)
+    # ... and writing to it afterwards leaves the copy alone.
+    dedup.add(np.array([300]), new)
+    assert dedup.find(new)[1].tolist() == [300]
+    assert copy.find(new)[1].tolist() == [200]
+
+
+def test_database_copy_does_not_deep_copy_the_deduplicator(embedding_model):
+    db = VectorDatabase(embedding_model, deduplicator=MinHashDeduplicator())
+    asyncio.run(db.abuild_from_list(unique_texts(100)))
+    copy = db.copy()
+    assert copy.deduplicator._signatures is db.deduplicator._signatures
+    copy.delete_ids([0])
+    asyncio.run(copy.abuild_from_list(["fresh text for the copy only " * 3]))
+    assert len(db.deduplicator) == 100
+    assert len(copy.deduplicator) == 100
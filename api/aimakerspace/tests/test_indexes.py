@@ -0,0 +1,121 @@
+import asyncio
+import numpy as np
+import pytest
+from aimakerspace.indexes.base import mmr_select, normalize, top_k
+from aimakerspace.indexes.binary import BinaryIndex
+from aimakerspace.indexes.hnsw import HNSWIndex
+from aimakerspace.indexes.ivf import IVFIndex
+from aimakerspace.indexes.matryoshka import MatryoshkaIndex
+from aimakerspace.indexes.pq import PQIndex
+from aimakerspace.indexes.scalar import ScalarQuantizedIndex
+from aimakerspace.vectordatabase import VectorDatabase
+
+CODE_STORE_INDEXES = [
+    lambda: BinaryIndex(),
+    lambda: BinaryIndex(rerank_k=0),
+    lambda: ScalarQuantizedIndex(),
+    lambda: PQIndex(n_subvectors=4),
+    lambda: MatryoshkaIndex(dims=8),
+]
+
+
+@pytest.fixture
+def unit(clustered):
+    return normalize(clustered(2000))[0]
+
+
+def test_top_k_orders_like_a_stable_descending_sort():
+    scores = np.array([0.5, 0.9, 0.5, 0.1, 0.9], dtype=np.float32)
+    assert top_k(scores, 3).tolist() == [1, 4, 0]
+    assert top_k(scores, 10).tolist() == [1, 4, 0, 2, 3]
+    assert top_k(scores, 0).tolist() == []
+
+
+def test_mmr_select_trades_relevance_for_diversity(unit):
+    candidates = unit[top_k(unit @ unit[0], 30)]
+    relevance = candidates @ unit[0]
+    similarity = candidates @ candidates.T
+    assert mmr_select(relevance, similarity, 10, 1.0).tolist() == top_k(relevance, 10).tolist()
+    picked = mmr_select(relevance, similarity, 10, 0.3)
+    assert picked[0] == 0 and len(set(picked.tolist())) == 10
+
+    def pairwise(rows):
+        return similarity[np.ix_(rows, rows)][np.triu_indices(10, 1)].mean()
+
+    # Diversified picks are less alike than the plain top-k.
+    assert pairwise(picked) < pairwise(np.arange(10))
+    assert len(mmr_select(relevance[:4], similarity[:4, :4], 10, 0.5)) == 4
+
+
+def test_hnsw_returns_k_rows_past_removed_neighbours(unit):
+    index = HNSWIndex(ef_search=16)
+    index.add(unit, np.arange(len(unit)))
+    nearest = np.argsort(-(unit @ unit[0]), kind="stable")
+    index.remove(nearest[:400])
+    rows, _ = index.search(unit[0], 10, unit)
+    assert len(rows) == 10
+    assert not np.isin(rows, nearest[:400]).any()
+
+
+def test_ivf_probes_past_nprobe_until_it_has_k_rows(unit):
+    index = IVFIndex(n_lists=50, nprobe=1)
+    index.train(unit)
+    index.add(unit, np.arange(len(unit)))
+    rows, _ = index.search(unit[0], 50, unit)
+    assert len(rows) == 50
+    index.remove(np.arange(1990))
+    assert sorted(index.search(unit[0], 50, unit)[0]) == list(range(1990, 2000))
+
+
+@pytest.mark.parametrize("make_index", [lambda: HNSWIndex(ef_search=16), lambda: IVFIndex(nprobe=1)])
+def test_database_searches_return_k_live_hits(embedding_model, clustered, make_index):
+    vectors = clustered(2000)
+    db = VectorDatabase(embedding_model, index=make_index(), compaction_threshold=1.0)
+    db.add([f"t{i}" for i in range(2000)], vectors)
+    db.train_index()
+    unit = normalize(vectors)[0]
+    db.delete_ids(np.argsort(-(unit @ unit[0]), kind="stable")[:400].tolist())
+    assert len(db.search(vectors[0], 10)) == 10
+    assert [len(results) for results in db.search_many(vectors[:3], 10)] == [10, 10, 10]
+
+
+@pytest.mark.parametrize("make_index", CODE_STORE_INDEXES)
+def test_code_store_indexes_follow_removals_and_compaction(unit, make_index):
+    index = make_index()
+    index.train(unit)
+    index.add(unit, np.arange(1000))
+    index.add(unit, np.arange(1000, 2000))
+    removed = np.arange(0, 2000, 7)
+    index.remove(removed)
+    rows, scores = index.search(unit[0], 20, unit)
+    assert len(rows) == 20
+    assert not np.isin(rows, removed).any()
+    assert np.all(np.diff(scores) <= 0)
+    keep = np.setdiff1d(np.arange(2000), removed)
+    index.compact(keep)
+    rows, _ = index.search(unit[1], 20, unit[keep])
+    restored = type(index).from_state(index.params(), index.state())
+    assert restored.search(unit[1], 20, unit[keep])[0].tolist() == rows.tolist()
+    assert restored.nbytes == index.nbytes > 0
+
+
+@pytest.mark.parametrize("make_index", CODE_STORE_INDEXES[:1] + CODE_STORE_INDEXES[2:])
+def test_reranked_scores_are_exact_cosines(unit, make_index):
+    index = make_index()
+    index.train(unit)
+    index.add(unit, np.arange(len(unit)))
+    rows, scores = index.search(unit[5], 10, unit)
+    np.testing.assert_allclose(scores, unit[rows] @ unit[5], rtol=1e-6)
+    assert rows[0] == 5
+
+
+def test_hnsw_rows_are_inserted_when_they_are_added(embedding_model, clustered):
+    vectors = clustered(300)
+    db = VectorDatabase(embedding_model, index=HNSWIndex())
+    db.add([f"t{i}" for i in range(200)], vectors[:200])
+    assert len(db.index) == 200
+    db.upsert([f"t{i}" for i in range(150, 300)], vectors[150:])
+    assert len(db.index) == 300
+    asyncio.run(db.abuild_from_list([f"built {i}" for i in range(50)]))
+    # No search has run, so the writer inserted every node itself.
+    assert len(db.index) == len(db) == 350
@@ -0,0 +1,48 @@
+import numpy as np
+from aimakerspace.query_cache import EmbeddingCache
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = EmbeddingCache(maxsize=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    assert cache.get("a").tolist() == [1.0]
+    cache.put("c", [3.0])
+    assert cache.get("b") is None
+    assert [cache.get(key).tolist() for key in ("a", "c")] == [[1.0], [3.0]]
+    assert cache.info() == {"hits": 3, "misses": 1, "size": 2, "maxsize": 2, "ttl": None}
+
+
+def test_entries_expire_after_the_ttl():
+    clock = Clock()
+    cache = EmbeddingCache(ttl=10, clock=clock)
+    cached = cache.put("a", [1.0, 2.0])
+    assert cached.dtype == np.float32 and not cached.flags.writeable
+    clock.now = 10
+    assert cache.get("a") is not None
+    clock.now = 10.5
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_batch_search_embeds_only_uncached_queries(embedding_model, clustered):
+    db = VectorDatabase(embedding_model)
+    db.add([f"t{i}" for i in range(20)], clustered(20))
+    db.search_by_text("first   query", 3)
+    embedded = embedding_model.texts_embedded
+    requests = embedding_model.requests
+    db.search_by_texts(["first query", "second query", "third query"], 3)
+    # Whitespace-normalized keys hit the cache; the rest go in one request.
+    assert embedding_model.texts_embedded == embedded + 2
+    assert embedding_model.requests == requests + 1
+    db.search_by_texts(["second query", "third query"], 3)
+    assert embedding_model.requests == requests + 1
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from aimakerspace.search_stats import SearchStats
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_nested_calls_are_recorded_once_by_the_outermost():
+    clock = Clock()
+    stats = SearchStats(clock=clock)
+    with stats.timed("batch", queries=4):
+        with stats.timed("vector"):
+            clock.now += 0.002
+    with pytest.raises(RuntimeError):
+        with stats.timed("vector"):
+            raise RuntimeError
+    info = stats.info()
+    assert info["calls"] == 1
+    assert list(info["by_kind"]) == ["batch"]
+    assert info["by_kind"]["batch"]["queries"] == 4
+    assert info["by_kind"]["batch"]["mean_ms"] == pytest.approx(2)
+
+
+def test_quantiles_are_histogram_bucket_bounds():
+    stats = SearchStats()
+    for _ in range(98):
+        stats.record("vector", 0.0008)
+    stats.record("vector", 0.02)
+    stats.record("vector", 5.0)
+    kind = stats.info()["by_kind"]["vector"]
+    assert (kind["p50_ms"], kind["p99_ms"]) == (1, 25)
+    assert kind["max_ms"] == pytest.approx(5000)
+    assert kind["histogram"][-1] == 1 and sum(kind["histogram"]) == 100
+    stats.record("vector", 5.0)
+    assert stats.info()["by_kind"]["vector"]["p99_ms"] is None
+
+
+def test_database_counts_each_search_by_kind(embedding_model, clustered):
+    vectors = clustered(50)
+    db = VectorDatabase(embedding_model)
+    db.add([f"t{i}" for i in range(50)], vectors)
+    db.search(vectors[0], 5, distance_measure="euclidean")
+    db.search_many(vectors[:3], 5)
+    db.search_range(vectors[0], 0.9)
+    db.search_by_text("t1", 5, mode="lexical")
+    kinds = db.stats()["searches"]["by_kind"]
+    assert {kind: stats["calls"] for kind, stats in kinds.items()} == {
+        "vector": 1, "batch": 1, "range": 1, "lexical": 1
+    }
+    assert kinds["batch"]["queries"] == 3
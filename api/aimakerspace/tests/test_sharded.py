@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from aimakerspace.sharded import ShardedVectorDatabase
+from aimakerspace.vectordatabase import VectorDatabase
+
+TOPICS = ["python", "numpy", "testing", "indexes", "embeddings"]
+
+
+@pytest.fixture
+def saved(embedding_model, clustered, tmp_path):
+    db = VectorDatabase(embedding_model)
+    db.add(
+        [f"chunk {i} about {TOPICS[i % 5]}" for i in range(500)],
+        clustered(500),
+        [{"document": f"d{i % 3}"} for i in range(500)],
+    )
+    db.save(str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def pair(embedding_model, saved):
+    with ShardedVectorDatabase(saved, n_shards=3, embedding_model=embedding_model) as sharded:
+        yield sharded, VectorDatabase.load(saved, embedding_model)
+
+
+def same(results, expected):
+    """Equal hits and metadata in the same order, with scores within rounding."""
+    if results and isinstance(results[0], str):
+        assert results == expected
+        return
+    assert [result[:1] + result[2:] for result in results] == [
+        result[:1] + result[2:] for result in expected
+    ]
+    assert [result[1] for result in results] == pytest.approx([result[1] for result in expected])
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"with_metadata": True},
+        {"filter": {"document": "d1"}},
+        {"distance_measure": "euclidean"},
+        {"mmr": True, "fetch_k": 30, "lambda_": 0.3},
+    ],
+)
+def test_search_matches_the_database(pair, clustered, options):
+    sharded, db = pair
+    for query in clustered(3, seed=1):
+        same(sharded.search(query, 10, **options), db.search(query, 10, **options))
+    if options.get("mmr"):
+        return
+    queries = clustered(4, seed=2)
+    for results, expected in zip(
+        sharded.search_many(queries, 10, **options), db.search_many(queries, 10, **options)
+    ):
+        same(results, expected)
+
+
+def test_search_range_matches_the_database(pair, clustered):
+    sharded, db = pair
+    query = clustered(1, seed=1)[0]
+    same(sharded.search_range(query, 0.8), db.search_range(query, 0.8))
+    assert sharded.search_range(query, 1.1) == []
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"with_metadata": True, "filter": {"document": ["d0", "d2"]}},
+        {"mode": "lexical"},
+        {"mode": "hybrid", "with_metadata": True},
+        {"min_score": 0.2},
+        {"mmr": True, "lambda_": 0.7},
+        {"return_as_text": True},
+    ],
+)
+def test_text_searches_match_the_database(pair, options):
+    sharded, db = pair
+    expected = db.search_by_text("chunk 7 about python", 8, **options)
+    same(sharded.search_by_text("chunk 7 about python", 8, **options), expected)
+    same(asyncio.run(sharded.asearch_by_text("chunk 7 about python", 8, **options)), expected)
+
+
+def test_search_by_texts_matches_the_database(pair):
+    sharded, db = pair
+    queries = ["numpy arrays", "testing indexes"]
+    for results, expected in zip(
+        sharded.search_by_texts(queries, 5, with_metadata=True),
+        db.search_by_texts(queries, 5, with_metadata=True),
+    ):
+        same(results, expected)
+    for results, expected in zip(
+        asyncio.run(sharded.asearch_by_texts(queries, 5, return_as_text=True)),
+        db.search_by_texts(queries, 5, return_as_text=True),
+    ):
+        assert results == expected
+    assert sharded.search_by_texts([], 5) == []
+    assert asyncio.run(sharded.asearch_by_texts([], 5)) == []
@@ -0,0 +1,290 @@
+import asyncio
+import os
+import numpy as np
+import pytest
+import threading
+from aimakerspace.indexes.ivf import IVFIndex
+from aimakerspace.indexes.pq import PQIndex
+from aimakerspace.metrics import cosine_similarity
+from aimakerspace.vectordatabase import VectorDatabase
+
+
+def per_pair_search(texts, vectors, query, k):
+    """The original search: one cosine_similarity call per stored vector."""
+    scores = [(text, cosine_similarity(query, vector)) for text, vector in zip(texts, vectors)]
+    return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
+
+
+def build(embedding_model, texts, vectors, **kwargs):
+    db = VectorDatabase(embedding_model, **kwargs)
+    db.add(texts, vectors)
+    return db
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_matrix_search_matches_per_pair_loop(embedding_model, clustered, dtype):
+    vectors = clustered(300)
+    texts = [f"chunk {i}" for i in range(300)]
+    db = build(embedding_model, texts, vectors, dtype=dtype)
+    tolerance = 1e-5 if dtype == "float32" else 2e-3
+    for query in clustered(5, seed=1):
+        expected = per_pair_search(texts, vectors, query, 10)
+        results = db.search(query, 10)
+        assert [text for text, _ in results] == [text for text, _ in expected]
+        np.testing.assert_allclose(
+            [score for _, score in results], [score for _, score in expected], atol=tolerance
+        )
+
+
+def test_ties_keep_insertion_order(embedding_model):
+    vectors = np.array([[1, 0], [0, 1], [1, 0], [1, 0]], dtype=np.float32)
+    texts = ["a", "b", "c", "d"]
+    db = build(embedding_model, texts, vectors)
+    query = np.array([1, 0], dtype=np.float32)
+    assert [text for text, _ in db.search(query, 3)] == ["a", "c", "d"]
+    assert db.search(query, 3) == [
+        (text, pytest.approx(score)) for text, score in per_pair_search(texts, vectors, query, 3)
+    ]
+
+
+def test_k_larger_than_count_and_zero(embedding_model, clustered):
+    vectors = clustered(5)
+    db = build(embedding_model, [f"t{i}" for i in range(5)], vectors)
+    assert len(db.search(vectors[0], 50)) == 5
+    assert db.search(vectors[0], 0) == []
+    assert db.search_many(vectors[:2], 0) == [[], []]
+    assert VectorDatabase(embedding_model).search(vectors[0], 3) == []
+
+
+def test_tombstoned_rows_are_never_returned(embedding_model, clustered):
+    vectors = clustered(100)
+    texts = [f"t{i}" for i in range(100)]
+    db = build(embedding_model, texts, vectors, compaction_threshold=1.0)
+    db.delete(texts[:10])
+    assert len(db) == 90
+    results = db.search(vectors[0], 100)
+    assert len(results) == 90
+    assert not {text for text, _ in results} & set(texts[:10])
+    db.compact()
+    assert [text for text, _ in db.search(vectors[50], 5)] == [
+        text for text, _ in per_pair_search(texts[10:], vectors[10:], vectors[50], 5)
+    ]
+
+
+def test_save_and_load_round_trip(embedding_model, clustered, tmp_path):
+    vectors = clustered(50)
+    texts = [f"t{i}" for i in range(50)]
+    db = VectorDatabase(embedding_model)
+    db.add(texts, vectors, [{"document": f"d{i % 3}"} for i in range(50)])
+    db.save(str(tmp_path), info={"corpus_hash": "abc"})
+    loaded = VectorDatabase.load(str(tmp_path), embedding_model)
+    assert len(loaded) == 50
+    assert loaded.search(vectors[7], 5) == db.search(vectors[7], 5)
+    assert loaded.retrieve_metadata("t4") == {"document": "d1"}
+    assert VectorDatabase.read_info(str(tmp_path)) == {"corpus_hash": "abc"}
+    assert loaded.stats()["memory_mapped"]
+    assert not VectorDatabase.load(str(tmp_path), embedding_model, mmap=False).stats()[
+        "memory_mapped"
+    ]
+
+
+def test_save_over_own_memory_map(embedding_model, clustered, tmp_path):
+    vectors = clustered(60)
+    build(embedding_model, [f"t{i}" for i in range(50)], vectors[:50]).save(str(tmp_path))
+    loaded = VectorDatabase.load(str(tmp_path), embedding_model)
+    reader = VectorDatabase.load(str(tmp_path), embedding_model)
+    before = reader.search(vectors[3], 5)
+    loaded.add([f"t{i}" for i in range(50, 60)], vectors[50:])
+    loaded.save(str(tmp_path))
+    # A reader mapping the old files keeps its contents.
+    assert reader.search(vectors[3], 5) == before
+    reloaded = VectorDatabase.load(str(tmp_path), embedding_model)
+    assert len(reloaded) == 60
+    assert reloaded.search(vectors[55], 1)[0][0] == "t55"
+
+
+def test_save_drops_stale_index_state(embedding_model, clustered, tmp_path):
+    vectors = clustered(300)
+    texts = [f"t{i}" for i in range(300)]
+    db = build(embedding_model, texts, vectors, index=IVFIndex())
+    db.train_index()
+    db.save(str(tmp_path))
+    assert "ann_index.npz" in os.listdir(tmp_path)
+    build(embedding_model, texts, vectors).save(str(tmp_path))
+    assert "ann_index.npz" not in os.listdir(tmp_path)
+    assert VectorDatabase.load(str(tmp_path), embedding_model).index is None
+
+
+def test_copy_leaves_the_original_unchanged(embedding_model, clustered):
+    vectors = clustered(40)
+    db = build(embedding_model, [f"t{i}" for i in range(30)], vectors[:30])
+    before = db.search(vectors[0], 5)
+    copy = db.copy()
+    copy.add([f"t{i}" for i in range(30, 40)], vectors[30:])
+    copy.delete(["t0"])
+    assert db.search(vectors[0], 5) == before
+    assert len(db) == 30 and len(copy) == 39
+
+
+def test_search_returns_each_hits_own_metadata(embedding_model):
+    # Two documents share a chunk; each hit must name its own document.
+    vectors = np.array([[1, 0, 0], [0, 1, 0], [1, 0.1, 0]], dtype=np.float32)
+    db = VectorDatabase(embedding_model)
+    db.add(
+        ["shared chunk", "other", "shared chunk"],
+        vectors,
+        [{"document": "a.txt"}, {"document": "b.txt"}, {"document": "c.txt"}],
+    )
+    results = db.search(vectors[0], 2, with_metadata=True)
+    assert [metadata["document"] for _, _, metadata in results] == ["a.txt", "c.txt"]
+    results = db.search_by_text("shared chunk", 2, mode="lexical", with_metadata=True)
+    assert {metadata["document"] for _, _, metadata in results} == {"a.txt", "c.txt"}
+    batches = db.search_many(vectors[:1], 2, "euclidean", with_metadata=True)
+    assert [metadata["document"] for _, _, metadata in batches[0]] == ["a.txt", "c.txt"]
+
+
+@pytest.mark.parametrize("option", [{"mmr": True}, {"min_score": 0.5}])
+def test_text_search_rejects_cosine_only_options_for_other_metrics(embedding_model, option):
+    db = build(embedding_model, ["a", "b"], np.eye(16, dtype=np.float32)[:2])
+    requests = embedding_model.requests
+    with pytest.raises(ValueError, match="cosine metric"):
+        db.search_by_text("query", 2, distance_measure="euclidean", **option)
+    with pytest.raises(ValueError, match="cosine metric"):
+        asyncio.run(db.asearch_by_text("query", 2, distance_measure="euclidean", **option))
+    assert embedding_model.requests == requests
+
+
+def test_abuild_from_list_retrains_as_the_database_grows(embedding_model):
+    db = VectorDatabase(embedding_model, index=IVFIndex())
+    asyncio.run(db.abuild_from_list([f"first {i}" for i in range(20)]))
+    assert len(db.index.centroids) == 4
+    asyncio.run(db.abuild_from_list([f"second {i}" for i in range(400)]))
+    assert len(db.index.centroids) == int(np.sqrt(420))
+    pq = VectorDatabase(embedding_model, index=PQIndex(n_subvectors=4))
+    asyncio.run(pq.abuild_from_list([f"first {i}" for i in range(20)]))
+    assert pq.index.codebooks.shape[1] == 20
+    asyncio.run(pq.abuild_from_list([f"second {i}" for i in range(300)]))
+    assert pq.index.codebooks.shape[1] == 256
+
+
+def test_concurrent_readers_sync_a_published_copy_once(embedding_model, clustered):
+    vectors = clustered(3000)
+    db = build(embedding_model, [f"t{i}" for i in range(2000)], vectors[:2000], index=IVFIndex())
+    db.train_index()
+    published = db.copy()
+    published.add([f"t{i}" for i in range(2000, 3000)], vectors[2000:])
+    barrier = threading.Barrier(8)
+    results = []
+
+    def read():
+        barrier.wait()
+        results.append(published.search(vectors[2500], 5))
+
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(len(members) for members in published.index._lists) == 3000
+    for result in results:
+        assert len({text for text, _ in result}) == 5
+
+
+def test_asearch_by_texts_awaits_only_uncached_embeddings(embedding_model, clustered, monkeypatch):
+    db = build(embedding_model, [f"t{i}" for i in range(200)], clustered(200))
+    queries = ["first query", "second query", "third query"]
+    db.search_by_text("second query", 5)
+    requested = []
+    fetch = embedding_model.async_get_embeddings
+
+    async def record(texts):
+        requested.append(list(texts))
+        return await fetch(texts)
+
+    monkeypatch.setattr(embedding_model, "async_get_embeddings", record)
+    results = asyncio.run(db.asearch_by_texts(queries, 5, with_metadata=True))
+    assert requested == [["first query", "third query"]]
+    assert results == db.search_by_texts(queries, 5, with_metadata=True)
+    # Past the offload threshold the batch is scored in a worker thread.
+    threads = []
+    search_many = db.search_many
+
+    def scored_in(*args):
+        threads.append(threading.get_ident())
+        return search_many(*args)
+
+    monkeypatch.setattr("aimakerspace.vectordatabase._OFFLOAD_ELEMENTS", 0)
+    monkeypatch.setattr(db, "search_many", scored_in)
+    assert asyncio.run(db.asearch_by_texts(queries, 5)) == db.search_by_texts(queries, 5)
+    assert threads[0] != threading.get_ident()
+
+
+def test_search_range_thresholds_every_score(embedding_model, clustered, monkeypatch):
+    vectors = clustered(300)
+    texts = [f"t{i}" for i in range(300)]
+    db = build(embedding_model, texts, vectors)
+    expected = [hit for hit in per_pair_search(texts, vectors, vectors[0], 300) if hit[1] >= 0.9]
+    results = db.search_range(vectors[0], 0.9)
+    assert 5 < len(results) < 300
+    assert [text for text, _ in results] == [text for text, _ in expected]
+    assert [text for text, _ in db.search_range(vectors[0], 0.9, max_results=5)] == [
+        text for text, _ in expected[:5]
+    ]
+    assert db.search_range(vectors[0], 0.9, filter={"document": "none"}) == []
+
+    def ranked(*args):
+        raise AssertionError("nothing cleared the threshold, so nothing is ranked")
+
+    monkeypatch.setattr("aimakerspace.vectordatabase.top_k", ranked)
+    assert db.search_range(vectors[0], 1.01) == []
+
+
+def test_filters_accept_values_lists_and_predicates(embedding_model, clustered):
+    vectors = clustered(60)
+    db = VectorDatabase(embedding_model)
+    db.add(
+        [f"t{i}" for i in range(60)],
+        vectors,
+        [{"document": f"d{i % 3}", "page": i // 10} for i in range(60)],
+    )
+
+    def documents(results):
+        return {db.retrieve_metadata(text)["document"] for text, _ in results}
+
+    assert documents(db.search(vectors[0], 60, filter={"document": "d1"})) == {"d1"}
+    assert documents(db.search(vectors[0], 60, filter={"document": ["d0", "d2"]})) == {"d0", "d2"}
+    results = db.search(vectors[0], 60, filter={"page": lambda page: page >= 4, "document": "d0"})
+    assert sorted(int(text[1:]) for text, _ in results) == list(range(42, 60, 3))
+    assert db.search(vectors[0], 5, filter={"missing": 1}) == []
+    assert db.delete_where({"page": [0, 1]}) == 20
+    assert len(db) == 40
+    assert min(db.retrieve_metadata(text)["page"] for text, _ in db.search(vectors[0], 60)) == 2
+    assert db.delete_where({"page": 0}) == 0
+    with pytest.raises(ValueError, match="non-empty filter"):
+        db.delete_where({})
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        {},
+        {"mode": "lexical"},
+        {"mode": "hybrid"},
+        {"mmr": True},
+        {"min_score": 0.3},
+        {"distance_measure": "euclidean", "with_metadata": True},
+        {"return_as_text": True},
+    ],
+)
+def test_asearch_by_text_matches_search_by_text(embedding_model, clustered, monkeypatch, options):
+    db = VectorDatabase(embedding_model)
+    db.add(
+        [f"chunk {i} about {i % 7}" for i in range(200)],
+        clustered(200),
+        [{"n": i} for i in range(200)],
+    )
+    expected = db.search_by_text("chunk 3 about 3", 8, **options)
+    assert asyncio.run(db.asearch_by_text("chunk 3 about 3", 8, **options)) == expected
+    # Offloaded to a worker thread, the results are the same.
+    monkeypatch.setattr("aimakerspace.vectordatabase._OFFLOAD_ELEMENTS", 0)
+    assert asyncio.run(db.asearch_by_text("chunk 3 about 3", 8, **options)) == expected
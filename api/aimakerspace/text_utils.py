@@ -66,6 +66,8 @@ class CharacterTextSplitter:
 class PDFLoader:
     def __init__(self, path: str):
         self.documents = []
+        # Character offset at which each page starts, per document
+        self.page_offsets = []
         self.path = path
         print(f"PDFLoader initialized with path: {self.path}")
 
@@ -96,10 +98,13 @@ class PDFLoader:
             
             # Extract text from each page
             text = ""
+            offsets = []
             for page in pdf_reader.pages:
+                offsets.append(len(text))
                 text += page.extract_text() + "\n"
             
             self.documents.append(text)
+            self.page_offsets.append(offsets)
 
     def load_directory(self):
         for root, _, files in os.walk(self.path):
@@ -111,10 +116,13 @@ class PDFLoader:
                         
                         # Extract text from each page
                         text = ""
+                        offsets = []
                         for page in pdf_reader.pages:
+                            offsets.append(len(text))
                             text += page.extract_text() + "\n"
                         
                         self.documents.append(text)
+                        self.page_offsets.append(offsets)
 
     def load_documents(self):
         self.load()
@@ -1,58 +1,1444 @@
+import copy
 import numpy as np
-from collections import defaultdict
-from typing import List, Tuple, Callable
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Callable, Union
 from aimakerspace.openai_utils.embedding import EmbeddingModel
+from aimakerspace import arrow_io
+from aimakerspace.bm25 import BM25Index
+from aimakerspace.chunkstore import ChunkStore, hash_texts
+from aimakerspace.dedup import MinHashDeduplicator
+from aimakerspace.indexes.base import (
+    VectorIndex,
+    mmr_select,
+    normalize,
+    read_only,
+    recall_at_k,
+    scan_scores,
+    top_k,
+)
+from aimakerspace.indexes.binary import BinaryIndex
+from aimakerspace.indexes.hnsw import HNSWIndex
+from aimakerspace.indexes.ivf import IVFIndex
+from aimakerspace.indexes.matryoshka import MatryoshkaIndex
+from aimakerspace.indexes.pq import PQIndex
+from aimakerspace.indexes.scalar import ScalarQuantizedIndex
+from aimakerspace.metadata import Filter, MetadataStore
+from aimakerspace.metrics import Metric, cosine_similarity, get_metric
+from aimakerspace.query_cache import EmbeddingCache
+from aimakerspace.search_stats import SearchStats
 import asyncio
+import functools
+import json
+import os
+import threading
 
+# On-disk layout written by VectorDatabase.save: the unit-norm matrix in its
+# storage dtype, its norms and the chunk store as raw .npy blocks, plus a JSON sidecar with
+# metadata and info.
+INDEX_FORMAT_VERSION = 2
+_VECTORS_FILE = "vectors.npy"
+_NORMS_FILE = "norms.npy"
+_CHUNKS_FILE = "chunks.npy"
+_CHUNK_OFFSETS_FILE = "chunk_offsets.npy"
+_CHUNK_HASHES_FILE = "chunk_hashes.npy"
+_CHUNK_IDS_FILE = "chunk_ids.npy"
+_SIDECAR_FILE = "index.json"
+_INDEX_STATE_FILE = "ann_index.npz"
 
-def cosine_similarity(vector_a: np.array, vector_b: np.array) -> float:
-    """Computes the cosine similarity between two vectors."""
-    dot_product = np.dot(vector_a, vector_b)
-    norm_a = np.linalg.norm(vector_a)
-    norm_b = np.linalg.norm(vector_b)
-    return dot_product / (norm_a * norm_b)
+# Approximate index types VectorDatabase.load can restore, by VectorIndex.name.
+INDEX_TYPES = {
+    index_type.name: index_type
+    for index_type in (
+        IVFIndex,
+        HNSWIndex,
+        PQIndex,
+        ScalarQuantizedIndex,
+        BinaryIndex,
+        MatryoshkaIndex,
+    )
+}
+
+# Storage dtypes for the vector matrix. float16 halves memory; scores are
+# still accumulated in float32.
+STORAGE_DTYPES = ("float32", "float16")
+
+# Upper bound on the query-by-row score block materialized at once by
+# search_many (~64 MB of float32).
+_SCORE_BLOCK_ELEMENTS = 16_000_000
+
+# abuild_from_list retrains an index that needs training once the live rows
+# reach this multiple of the rows it was last trained on, so a small first
+# upload does not fix IVF cells or PQ codebooks for good. Growing
+# geometrically keeps the total training work linear in the rows added.
+_RETRAIN_GROWTH = 2
+
+# search_by_text modes: embedding similarity, BM25 keywords, or both fused.
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+
+# Reciprocal rank fusion constant; 60 is the value from the original paper.
+_RRF_K = 60
+
+# Candidates taken from each ranking before hybrid fusion.
+_HYBRID_DEPTH = 50
+
+# Stored elements (rows x dimensions, times the queries) above which the async
+# searches score in a worker thread instead of on the event loop (a few ms of
+# BLAS work).
+_OFFLOAD_ELEMENTS = 4_000_000
+
+
+def _replace_file(path: str, write: Callable[[Any], None]) -> None:
+    """
+    Writes a file under a temporary name with ``write(f)`` and renames it
+    over ``path``. Files are never truncated in place, so a process that
+    memory-mapped the old file keeps reading its (now unlinked) contents
+    instead of crashing or seeing the new bytes.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _check_mode(
+    mode: str,
+    mmr: bool = False,
+    distance_measure: Union[str, Callable] = "cosine",
+    min_score: Optional[float] = None,
+) -> None:
+    """Rejects option combinations before a text search embeds its query."""
+    if mode not in SEARCH_MODES:
+        raise ValueError(
+            f"Unknown search mode {mode!r}, expected one of {SEARCH_MODES}"
+        )
+    if mmr and mode != "vector":
+        raise ValueError("mmr is only supported in vector mode")
+    if mode == "vector" and not get_metric(distance_measure).is_cosine:
+        # MMR compares results by cosine similarity, and min_score is a
+        # similarity floor that distances (lower is better) cannot honour.
+        if mmr:
+            raise ValueError("mmr is only supported with the cosine metric")
+        if min_score is not None:
+            raise ValueError("min_score is only supported with the cosine metric")
+
+
+class _VectorView(Mapping):
+    """
+    Read-only ``key -> vector`` view over the matrix storage, keyed by chunk
+    text. Chunks stored more than once appear once per copy.
+    """
+
+    def __init__(self, db: "VectorDatabase"):
+        self._db = db
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        vector = self._db.retrieve_from_key(key)
+        if vector is None:
+            raise KeyError(key)
+        return vector
+
+    def __iter__(self) -> Iterator[str]:
+        db = self._db
+        live_rows = np.flatnonzero(db._alive[: db._count]).tolist()
+        return (db._chunks.get(row) for row in live_rows)
+
+    def __len__(self) -> int:
+        return len(self._db)
 
 
 class VectorDatabase:
-    def __init__(self, embedding_model: EmbeddingModel = None):
-        self.vectors = defaultdict(np.array)
+    """
+    Exact nearest-neighbour store backed by a contiguous float32 (or
+    float16) matrix.
+
+    Rows are normalized on insert so cosine scoring of the whole index is one
+    matrix-vector product, and the top-k is picked with a partial selection
+    instead of a full sort. An optional approximate ``index`` (see
+    ``aimakerspace.indexes``) replaces the full scan once it is trained.
+
+    The matrix grows by capacity doubling. Deleted rows are tombstoned and
+    masked out of every search until the dead fraction passes
+    ``compaction_threshold``, at which point live rows are packed together.
+
+    Each row can carry metadata (document, page, ...) that searches filter
+    on; the filter becomes a row mask before scoring, so a search limited to
+    one document only scores that document's rows.
+
+    Chunk text is kept in a ``ChunkStore`` rather than as dict keys, and each
+    chunk gets an integer id. Text is decoded only for returned results and
+    is found by a 64-bit hash when looked up by value.
+    """
+
+    def __init__(
+        self,
+        embedding_model: EmbeddingModel = None,
+        index: VectorIndex = None,
+        compaction_threshold: float = 0.25,
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = None,
+        dtype: str = "float32",
+        deduplicator: Optional[MinHashDeduplicator] = None,
+    ):
+        """
+        :param query_cache_size: Query embeddings kept by the text searches;
+            0 disables the cache
+        :param query_cache_ttl: Seconds a cached query embedding stays valid
+        :param dtype: Storage dtype of the vectors, one of ``STORAGE_DTYPES``;
+            float16 halves memory at a small cost in score precision
+        :param deduplicator: Checks the chunks given to ``abuild_from_list``
+            for near-duplicates of each other and of stored chunks, which
+            are then dropped or reuse an embedding instead of getting their
+            own; its state is not saved with the index
+        """
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(
+                f"Unknown storage dtype {dtype!r}; expected one of {STORAGE_DTYPES}"
+            )
+        self.dtype = np.dtype(dtype)
         self.embedding_model = embedding_model or EmbeddingModel()
+        self.index = index
+        self.deduplicator = deduplicator
+        self.compaction_threshold = compaction_threshold
+        self.query_cache = (
+            EmbeddingCache(query_cache_size, query_cache_ttl) if query_cache_size else None
+        )
+        self._chunks = ChunkStore()
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._next_id = 0
+        self._lexical: Optional[BM25Index] = None
+        # Guards the lazy index sync and BM25 build, which searches run and
+        # asearch_by_text runs in worker threads.
+        self._refresh_lock = threading.Lock()
+        self._matrix = np.empty((0, 0), dtype=self.dtype)
+        # Whether the matrix is read in place from a file (load with mmap,
+        # Arrow IPC import); cleared once it is reallocated or copied.
+        self._memory_mapped = False
+        self._norms = np.empty(0, dtype=np.float32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._metadata = MetadataStore()
+        self._count = 0
+        self._dead = 0
+        self._indexed = 0
+        # Live rows at the last train_index, for abuild_from_list's retraining.
+        self._trained_rows = 0
+        # Arrays whose stored rows a previous version still reads; see copy().
+        self._shared: Set[str] = set()
+        self.search_stats = SearchStats()
+
+    @property
+    def vectors(self) -> Mapping:
+        return _VectorView(self)
+
+    def __len__(self) -> int:
+        return self._count - self._dead
+
+    def _stored(self) -> np.ndarray:
+        """The used rows of the matrix, live and tombstoned."""
+        return self._matrix[: self._count]
+
+    def _reserve(self, rows: int, dim: int) -> None:
+        """Makes room for ``rows`` more rows, doubling capacity when full."""
+        needed = self._count + rows
+        capacity = len(self._matrix)
+        if self._count and dim != self._matrix.shape[1]:
+            raise ValueError(
+                f"Vector has {dim} dimensions, "
+                f"the database stores {self._matrix.shape[1]}"
+            )
+        if needed <= capacity and self._matrix.flags.writeable:
+            return
+        if needed > capacity:
+            capacity = max(needed, 2 * capacity, 64)
+        matrix = np.empty((capacity, dim), dtype=self.dtype)
+        if self._count:
+            matrix[: self._count] = self._stored()
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[: self._count] = self._norms[: self._count]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._count] = self._alive[: self._count]
+        hashes = np.empty(capacity, dtype=np.uint64)
+        hashes[: self._count] = self._hashes[: self._count]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: self._count] = self._ids[: self._count]
+        self._matrix, self._norms, self._alive = matrix, norms, alive
+        self._hashes, self._ids = hashes, ids
+        self._shared = set()
+        self._memory_mapped = False
+
+    def _unshare(self, *names: str) -> None:
+        """Takes private copies of arrays before stored rows are overwritten."""
+        for name in names:
+            array = getattr(self, name)
+            if name in self._shared or not array.flags.writeable:
+                setattr(self, name, array.copy())
+                self._shared.discard(name)
+                if name == "_matrix":
+                    self._memory_mapped = False
+
+    def _sync_index(self) -> None:
+        """
+        Adds rows not yet indexed to a trained index: new rows are added as
+        they are appended, earlier ones once the index is trained or loaded.
+        """
+        if not self._index_ready() or self._indexed == self._count:
+            return
+        with self._refresh_lock:
+            # Another reader may have synced while this one waited.
+            if self._indexed == self._count:
+                return
+            new_rows = np.arange(self._indexed, self._count)
+            self.index.add(self._stored(), new_rows[self._alive[new_rows]])
+            self._indexed = self._count
+
+    def _index_ready(self) -> bool:
+        return self.index is not None and self.index.is_trained
+
+    def train_index(self) -> None:
+        """(Re)trains the approximate index on every stored vector and fills it."""
+        if self.index is None:
+            raise ValueError("VectorDatabase has no approximate index to train")
+        if not len(self):
+            return
+        live_rows = np.flatnonzero(self._alive[: self._count])
+        self.index.train(self._stored()[live_rows].astype(np.float32, copy=False))
+        self.index.add(self._stored(), live_rows)
+        self._indexed = self._count
+        self._trained_rows = len(live_rows)
+
+    def _find_rows(self, keys: List[str]) -> Dict[str, List[int]]:
+        """Live rows whose chunk text is one of ``keys``, located by hash."""
+        wanted = set(keys)
+        candidates = np.flatnonzero(
+            np.isin(self._hashes[: self._count], hash_texts(list(wanted)))
+            & self._alive[: self._count]
+        )
+        found: Dict[str, List[int]] = {}
+        for row in candidates.tolist():
+            text = self._chunks.get(row)
+            if text in wanted:
+                found.setdefault(text, []).append(row)
+        return found
 
-    def insert(self, key: str, vector: np.array) -> None:
-        self.vectors[key] = vector
+    def _rows_of_ids(self, ids: List[int]) -> np.ndarray:
+        """Live rows holding chunk ``ids``; ids increase with the row number."""
+        ids = np.asarray(ids, dtype=np.int64)
+        if not self._count or not len(ids):
+            return np.empty(0, dtype=np.int64)
+        stored = self._ids[: self._count]
+        rows = np.minimum(np.searchsorted(stored, ids), self._count - 1)
+        return rows[(stored[rows] == ids) & self._alive[rows]]
+
+    def insert(
+        self, key: str, vector: np.array, metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        self.upsert([key], [vector], None if metadata is None else [metadata])
+
+    def upsert(
+        self,
+        keys: List[str],
+        vectors: np.array,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        Inserts new keys and overwrites the vectors of existing ones. A key is
+        the chunk text; every stored chunk with that text is updated.
+
+        :param metadata: Optional per-key dicts of JSON-compatible scalars;
+            columns not given for an existing key keep their values
+        """
+        if len(keys) == 0:
+            return
+        if metadata is not None and len(metadata) != len(keys):
+            raise ValueError("metadata must have one entry per key")
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(keys), -1)
+        unit, norms = normalize(vectors)
+        # The last occurrence of a repeated key wins, as with dict assignment.
+        latest = {key: i for i, key in enumerate(keys)}
+        found = self._find_rows(list(latest))
+        updates = [
+            (row, i) for key, i in latest.items() for row in found.get(key, [])
+        ]
+        additions = [i for key, i in latest.items() if key not in found]
+        self._reserve(len(additions), unit.shape[1])
+        if updates:
+            rows = np.array([row for row, _ in updates])
+            sources = np.array([i for _, i in updates])
+            self._unshare("_matrix", "_norms")
+            self._matrix[rows] = unit[sources]
+            self._norms[rows] = norms[sources]
+            indexed = rows[rows < self._indexed]
+            if self._index_ready() and len(indexed):
+                self.index.remove(indexed)
+                self.index.add(self._stored(), indexed)
+            if metadata is not None:
+                self._metadata.set(rows.tolist(), [metadata[i] for i in sources])
+        if additions:
+            self._append(
+                [keys[i] for i in additions],
+                unit[additions],
+                norms[additions],
+                None if metadata is None else [metadata[i] for i in additions],
+            )
+
+    def add(
+        self,
+        texts: List[str],
+        vectors: np.array,
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> np.ndarray:
+        """
+        Appends ``texts`` as new chunks, even when equal text is already
+        stored, so repeated chunks keep their own metadata.
+
+        :param metadata: Optional per-chunk dicts of JSON-compatible scalars
+        :return: The new chunks' integer ids
+        """
+        if metadata is not None and len(metadata) != len(texts):
+            raise ValueError("metadata must have one entry per text")
+        if len(texts) == 0:
+            return np.empty(0, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        unit, norms = normalize(vectors)
+        self._reserve(len(texts), unit.shape[1])
+        return self._append(list(texts), unit, norms, metadata)
+
+    def _append(
+        self,
+        texts: List[str],
+        unit: np.ndarray,
+        norms: np.ndarray,
+        metadata: Optional[List[Dict[str, Any]]],
+    ) -> np.ndarray:
+        """Writes new rows into space made by ``_reserve``; returns their ids."""
+        start, end = self._count, self._count + len(texts)
+        ids = np.arange(self._next_id, self._next_id + len(texts), dtype=np.int64)
+        self._matrix[start:end] = unit
+        self._norms[start:end] = norms
+        self._alive[start:end] = True
+        self._hashes[start:end] = hash_texts(texts)
+        self._ids[start:end] = ids
+        self._chunks.append(texts)
+        if self._lexical is not None:
+            self._lexical.add(texts)
+        self._count = end
+        self._next_id += len(texts)
+        if metadata is not None:
+            self._metadata.set(list(range(start, end)), metadata)
+        # Indexed here, by the writer, so an upload pays for its own HNSW
+        # inserts and a published copy is up to date before anyone reads it.
+        self._sync_index()
+        return ids
+
+    def delete(self, keys: List[str]) -> int:
+        """
+        Tombstones every chunk whose text is one of ``keys``; unknown keys
+        are ignored.
+
+        :return: Number of rows removed
+        """
+        found = self._find_rows(keys)
+        return self._delete_rows(
+            np.array([row for rows in found.values() for row in rows], dtype=np.int64)
+        )
+
+    def delete_ids(self, ids: List[int]) -> int:
+        """Tombstones the chunks with ``ids``; unknown ids are ignored."""
+        return self._delete_rows(self._rows_of_ids(ids))
+
+    def delete_where(self, filter: Filter) -> int:
+        """Tombstones every chunk whose metadata matches ``filter``."""
+        if not filter:
+            raise ValueError("delete_where needs a non-empty filter")
+        return self._delete_rows(self._filter_rows(filter))
+
+    def _delete_rows(self, rows: np.ndarray) -> int:
+        if not len(rows):
+            return 0
+        self._unshare("_alive")
+        self._alive[rows] = False
+        self._metadata.clear(rows)
+        if self.deduplicator is not None:
+            self.deduplicator.remove(self._ids[rows])
+        self._dead += len(rows)
+        indexed = rows[rows < self._indexed]
+        if self._index_ready() and len(indexed):
+            self.index.remove(indexed)
+        if self._dead > self.compaction_threshold * self._count:
+            self.compact()
+        return len(rows)
+
+    def compact(self) -> None:
+        """Packs live rows together, dropping tombstones; row numbers change."""
+        if not self._dead:
+            return
+        self._sync_index()
+        keep = np.flatnonzero(self._alive[: self._count])
+        capacity = max(len(self._matrix) // 2, len(keep), 64)
+        matrix = np.empty((capacity, self._matrix.shape[1]), dtype=self.dtype)
+        matrix[: len(keep)] = self._matrix[keep]
+        norms = np.empty(capacity, dtype=np.float32)
+        norms[: len(keep)] = self._norms[keep]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(keep)] = True
+        hashes = np.empty(capacity, dtype=np.uint64)
+        hashes[: len(keep)] = self._hashes[keep]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: len(keep)] = self._ids[keep]
+        if self._index_ready():
+            self.index.compact(keep)
+        self._metadata.compact(keep)
+        self._chunks.compact(keep)
+        if self._lexical is not None:
+            self._lexical.compact(keep)
+        self._matrix, self._norms, self._alive = matrix, norms, alive
+        self._hashes, self._ids = hashes, ids
+        self._count = self._indexed = len(keep)
+        self._dead = 0
+        self._shared = set()
+        self._memory_mapped = False
+
+    def copy(self) -> "VectorDatabase":
+        """
+        A copy-on-write copy for building the next version of the index
+        while readers keep searching this one, which must not change.
+
+        The copy shares the stored vectors and chunk text, appends into the
+        spare capacity after them, and takes private copies of those arrays
+        only before overwriting stored rows (upserts, deletes). This database
+        keeps read-only views, so its own next write reallocates. Metadata,
+        the lexical index and the approximate index are copied outright; the
+        query embedding cache and search stats are shared, and the
+        deduplicator is copied on write like the chunk text.
+        """
+        db = copy.copy(self)
+        db._refresh_lock = threading.Lock()
+        db._chunks = self._chunks.copy()
+        db._metadata = self._metadata.copy()
+        # Readers may be syncing this version's indexes; copy them whole.
+        with self._refresh_lock:
+            db._lexical = None if self._lexical is None else self._lexical.copy()
+            db.index = copy.deepcopy(self.index)
+            db._indexed = self._indexed
+        db.deduplicator = None if self.deduplicator is None else self.deduplicator.copy()
+        db._shared = {"_matrix", "_norms", "_alive"}
+        self._matrix, self._norms, self._alive = (
+            read_only(self._matrix),
+            read_only(self._norms),
+            read_only(self._alive),
+        )
+        self._hashes, self._ids = read_only(self._hashes), read_only(self._ids)
+        return db
 
     def search(
         self,
         query_vector: np.array,
         k: int,
-        distance_measure: Callable = cosine_similarity,
+        distance_measure: Union[str, Callable] = "cosine",
+        filter: Optional[Filter] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns the ``k`` stored keys most similar to ``query_vector``.
+
+        :param filter: Optional metadata conditions, e.g.
+            ``{"document": "report.pdf"}``; see ``MetadataStore.mask``
+        :param mmr: Pick the ``k`` results by maximal marginal relevance
+            among the ``fetch_k`` most similar, skipping near-duplicates of
+            results already picked; cosine metric only
+        :param fetch_k: MMR candidate pool; defaults to ``4 * k`` (at least 20)
+        :param lambda_: MMR trade-off, from 0 (most diverse) to 1 (plain top-k)
+        :param distance_measure: A name from ``aimakerspace.metrics.METRICS``
+            ("cosine", "dot", "euclidean", "negative_l2"), a registered
+            kernel, or a legacy per-pair callable (slow); see ``get_metric``.
+            Only cosine uses the approximate index.
+        :param with_metadata: Return ``(text, score, metadata)`` triples, the
+            metadata being that of the matching chunk itself (texts can
+            repeat across documents, so looking it up by text afterwards
+            may find another chunk)
+        """
+        with self.search_stats.timed("vector"):
+            metric = get_metric(distance_measure)
+            if not metric.is_cosine and mmr:
+                raise ValueError("mmr is only supported with the cosine metric")
+            if not len(self):
+                return []
+            if not metric.is_cosine:
+                return self.search_many(
+                    [query_vector], k, metric, filter, with_metadata
+                )[0]
+            query, _ = normalize(query_vector)
+            if mmr:
+                rows, scores = self._mmr_search_rows(
+                    query[0], k, self._filter_rows(filter), fetch_k, lambda_
+                )
+            else:
+                rows, scores = self._search_rows(query[0], k, self._filter_rows(filter))
+            return self._results(rows, scores, with_metadata)
+
+    def _results(
+        self, rows: np.ndarray, scores: np.ndarray, with_metadata: bool = False
     ) -> List[Tuple[str, float]]:
-        scores = [
-            (key, distance_measure(query_vector, vector))
-            for key, vector in self.vectors.items()
+        """``(text, score)`` pairs for result rows, plus their metadata if asked."""
+        if with_metadata:
+            return [
+                (self._chunks.get(row), float(score), self._metadata.get(row))
+                for row, score in zip(rows, scores)
+            ]
+        return [(self._chunks.get(row), float(score)) for row, score in zip(rows, scores)]
+
+    def _filter_rows(self, filter: Optional[Filter]) -> Optional[np.ndarray]:
+        """Live rows matching ``filter``, or None when there is no filter."""
+        if not filter:
+            return None
+        mask = self._metadata.mask(filter, self._count)
+        return np.flatnonzero(mask & self._alive[: self._count])
+
+    def _search_rows(
+        self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k ``(rows, scores)`` for a unit query, through the index if trained.
+
+        A filtered search scores the candidate ``rows`` exactly instead: the
+        approximate indexes cannot restrict their traversal to a subset.
+        """
+        if rows is not None:
+            return self._exact_search_rows(query, k, rows)
+        self._sync_index()
+        if self._index_ready():
+            return self._index_search_rows(query, k)
+        return self._exact_search_rows(query, k)
+
+    def _index_search_rows(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k through the trained index. Should it come back with fewer
+        than k rows while k are live, an exact scan answers instead.
+        """
+        rows, scores = self.index.search(query, k, self._stored())
+        if len(rows) < min(k, len(self)):
+            return self._exact_search_rows(query, k)
+        return rows, scores
+
+    def _mmr_search_rows(
+        self,
+        query: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        min_score: Optional[float] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """MMR re-ranking of the top ``fetch_k``; scores stay query similarities."""
+        fetch_k = max(fetch_k or max(4 * k, 20), k)
+        candidates, relevance = self._search_rows(query, fetch_k, rows)
+        if min_score is not None:
+            keep = relevance >= min_score
+            candidates, relevance = candidates[keep], relevance[keep]
+        vectors = np.asarray(self._stored()[candidates], dtype=np.float32)
+        picked = mmr_select(relevance, vectors @ vectors.T, k, lambda_)
+        return candidates[picked], relevance[picked]
+
+    def _mask_dead(self, scores: np.ndarray) -> np.ndarray:
+        """Sets tombstoned rows' scores (last axis) to -inf."""
+        if self._dead:
+            scores[..., ~self._alive[: self._count]] = -np.inf
+        return scores
+
+    def _score_rows(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """
+        Scores of ``rows`` (last axis) against unit ``queries``. A small
+        subset is gathered and scored on its own; a large one is cheaper to
+        take out of a full scan than to copy.
+        """
+        if 2 * len(rows) > self._count:
+            return scan_scores(self._stored(), queries)[..., rows]
+        return scan_scores(self._stored()[rows], queries)
+
+    def _exact_search_rows(
+        self, query: np.ndarray, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if rows is None:
+            scores = self._mask_dead(scan_scores(self._stored(), query))
+            best = top_k(scores, min(k, len(self)))
+            return best, scores[best]
+        scores = self._score_rows(query, rows)
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def recall_at_k(self, query_vectors: np.array, k: int) -> float:
+        """Mean recall@k of the approximate index against exact search."""
+        queries, _ = normalize(query_vectors)
+        recalls = [
+            recall_at_k(self._search_rows(query, k)[0], self._exact_search_rows(query, k)[0])
+            for query in queries
         ]
-        return sorted(scores, key=lambda x: x[1], reverse=True)[:k]
+        return float(np.mean(recalls)) if recalls else 1.0
+
+    def search_range(
+        self,
+        query_vector: np.array,
+        min_score: float,
+        max_results: Optional[int] = None,
+        filter: Optional[Filter] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Returns every stored key with cosine similarity of at least
+        ``min_score``, best first.
+
+        The threshold is applied to the whole score array at once, and
+        nothing is ranked or decoded when no row clears it. With a trained
+        index and a ``max_results`` bound, only the index's top
+        ``max_results`` candidates are thresholded.
+
+        :param max_results: Most results to return; None returns them all
+        """
+        with self.search_stats.timed("range"):
+            if not len(self):
+                return []
+            query, _ = normalize(query_vector)
+            rows, scores = self._range_search_rows(
+                query[0], min_score, max_results, self._filter_rows(filter)
+            )
+            return self._results(rows, scores)
+
+    def _range_search_rows(
+        self,
+        query: np.ndarray,
+        min_score: float,
+        max_results: Optional[int],
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if rows is None and max_results is not None and self._index_ready():
+            found, scores = self._search_rows(query, max_results)
+            keep = scores >= min_score
+            return found[keep], scores[keep]
+        if rows is None:
+            scores = self._mask_dead(scan_scores(self._stored(), query))
+            candidates = np.flatnonzero(scores >= min_score)
+            scores = scores[candidates]
+        else:
+            scores = self._score_rows(query, rows)
+            hits = np.flatnonzero(scores >= min_score)
+            candidates, scores = rows[hits], scores[hits]
+        if not len(candidates):
+            return candidates, scores
+        best = top_k(scores, len(candidates) if max_results is None else max_results)
+        return candidates[best], scores[best]
+
+    def search_many(
+        self,
+        query_vectors: np.array,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Searches a batch of queries, scoring each block with one matrix
+        product; ``with_metadata`` is as in ``search``.
+        """
+        with self.search_stats.timed("batch", len(query_vectors)):
+            metric = get_metric(distance_measure)
+            queries, query_norms = normalize(query_vectors)
+            if not len(self):
+                return [[] for _ in range(len(queries))]
+            rows = self._filter_rows(filter)
+            if not metric.is_cosine:
+                return [
+                    self._results(found, scores, with_metadata)
+                    for found, scores in self._metric_search_rows(
+                        queries, query_norms, k, metric, rows
+                    )
+                ]
+            self._sync_index()
+            if rows is None and self._index_ready():
+                results = []
+                for query in queries:
+                    found, scores = self._index_search_rows(query, k)
+                    results.append(self._results(found, scores, with_metadata))
+                return results
+            limit = min(k, len(self) if rows is None else len(rows))
+            row_ids = np.arange(self._count) if rows is None else rows
+            block = max(1, _SCORE_BLOCK_ELEMENTS // self._count)
+            results = []
+            for start in range(0, len(queries), block):
+                if rows is None:
+                    scores = self._mask_dead(
+                        scan_scores(self._stored(), queries[start : start + block])
+                    )
+                else:
+                    scores = self._score_rows(queries[start : start + block], rows)
+                for row_scores in scores:
+                    best = top_k(row_scores, limit)
+                    results.append(
+                        self._results(row_ids[best], row_scores[best], with_metadata)
+                    )
+            return results
+
+    def _metric_search_rows(
+        self,
+        queries: np.ndarray,
+        query_norms: np.ndarray,
+        k: int,
+        metric: Metric,
+        rows: Optional[np.ndarray] = None,
+    ) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Exact top-k ``(rows, scores)`` per unit query under ``metric``, with
+        one kernel call per block of queries.
+        """
+        if rows is None:
+            row_ids = np.arange(self._count)
+            matrix, norms = self._stored(), self._norms[: self._count]
+        else:
+            row_ids = rows
+            matrix, norms = self._stored()[rows], self._norms[rows]
+        limit = min(k, len(self) if rows is None else len(rows))
+        block = max(1, _SCORE_BLOCK_ELEMENTS // max(len(row_ids), 1))
+        results = []
+        for start in range(0, len(queries), block):
+            scores = metric.kernel(
+                queries[start : start + block],
+                query_norms[start : start + block],
+                matrix,
+                norms,
+            )
+            ranking = scores if metric.higher_is_better else -scores
+            if rows is None:
+                ranking = self._mask_dead(ranking)
+            for row_scores, row_ranking in zip(scores, ranking):
+                best = top_k(row_ranking, limit)
+                results.append((row_ids[best], row_scores[best]))
+        return results
+
+    def _lexical_index(self) -> BM25Index:
+        """The BM25 index over the stored chunks, built on first use."""
+        if self._lexical is None:
+            with self._refresh_lock:
+                if self._lexical is None:
+                    lexical = BM25Index()
+                    lexical.add(self._chunks.get_many(range(self._count)))
+                    self._lexical = lexical
+        return self._lexical
+
+    def _lexical_search_rows(
+        self, query_text: str, k: int, rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k ``(rows, BM25 scores)``; rows sharing no term are never returned."""
+        scores = self._lexical_index().scores(query_text)
+        if rows is None:
+            allowed = self._alive[: self._count]
+        else:
+            allowed = np.zeros(self._count, dtype=bool)
+            allowed[rows] = True
+        candidates = np.flatnonzero(allowed & (scores > 0))
+        best = top_k(scores[candidates], k)
+        return candidates[best], scores[candidates[best]]
+
+    def _hybrid_search_rows(
+        self,
+        query_text: str,
+        query: np.ndarray,
+        k: int,
+        rows: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k ``(rows, fused scores)`` by reciprocal rank fusion of both rankings."""
+        depth = max(k, _HYBRID_DEPTH)
+        rankings = [
+            self._search_rows(query, depth, rows)[0],
+            self._lexical_search_rows(query_text, depth, rows)[0],
+        ]
+        weights = np.concatenate(
+            [1.0 / (_RRF_K + 1 + np.arange(len(ranking))) for ranking in rankings]
+        )
+        fused_rows, inverse = np.unique(np.concatenate(rankings), return_inverse=True)
+        fused = np.bincount(inverse, weights=weights).astype(np.float32)
+        best = top_k(fused, k)
+        return fused_rows[best], fused[best]
+
+    def _query_key(self, query_text: str) -> Tuple[Any, ...]:
+        """Cache key: the model, its output width and whitespace-normalized text."""
+        return (
+            getattr(self.embedding_model, "embeddings_model_name", None),
+            getattr(self.embedding_model, "dimensions", None),
+            " ".join(query_text.split()),
+        )
+
+    def _embed_query(self, query_text: str) -> np.ndarray:
+        if self.query_cache is None:
+            return self.embedding_model.get_embedding(query_text)
+        key = self._query_key(query_text)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        return self.query_cache.put(key, self.embedding_model.get_embedding(query_text))
+
+    async def _aembed_query(self, query_text: str) -> np.ndarray:
+        if self.query_cache is None:
+            return await self.embedding_model.async_get_embedding(query_text)
+        key = self._query_key(query_text)
+        cached = self.query_cache.get(key)
+        if cached is not None:
+            return cached
+        embedding = await self.embedding_model.async_get_embedding(query_text)
+        return self.query_cache.put(key, embedding)
+
+    def _embed_queries(self, query_texts: List[str]) -> List[np.ndarray]:
+        """Embeds a batch, requesting only the texts missing from the cache."""
+        if self.query_cache is None:
+            return self.embedding_model.get_embeddings(query_texts)
+        keys = [self._query_key(text) for text in query_texts]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fetched = self.embedding_model.get_embeddings(
+                [query_texts[i] for i in missing]
+            )
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = self.query_cache.put(keys[i], embedding)
+        return embeddings
+
+    async def _aembed_queries(self, query_texts: List[str]) -> List[np.ndarray]:
+        if self.query_cache is None:
+            return await self.embedding_model.async_get_embeddings(query_texts)
+        keys = [self._query_key(text) for text in query_texts]
+        embeddings = [self.query_cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            fetched = await self.embedding_model.async_get_embeddings(
+                [query_texts[i] for i in missing]
+            )
+            for i, embedding in zip(missing, fetched):
+                embeddings[i] = self.query_cache.put(keys[i], embedding)
+        return embeddings
 
     def search_by_text(
         self,
         query_text: str,
         k: int,
-        distance_measure: Callable = cosine_similarity,
+        distance_measure: Union[str, Callable] = "cosine",
         return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        mode: str = "vector",
+        min_score: Optional[float] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
     ) -> List[Tuple[str, float]]:
-        query_vector = self.embedding_model.get_embedding(query_text)
-        results = self.search(query_vector, k, distance_measure)
-        return [result[0] for result in results] if return_as_text else results
+        """
+        Returns the ``k`` stored chunks most relevant to ``query_text``.
+
+        :param mode: "vector" ranks by embedding similarity; "lexical" by
+            BM25 keyword score, without calling the embedding API; "hybrid"
+            fuses both rankings with reciprocal rank fusion. Lexical and
+            hybrid scores are not cosine similarities.
+        :param min_score: Drop results scoring below this; in vector mode
+            this is a ``search_range`` capped at ``k`` results and needs
+            the cosine metric
+        :param mmr: Diversify vector results; see ``search``
+        :param with_metadata: Return ``(text, score, metadata)`` triples;
+            see ``search``. Ignored with ``return_as_text``
+        """
+        _check_mode(mode, mmr, distance_measure, min_score)
+        query_vector = None
+        if mode != "lexical":
+            query_vector = self._embed_query(query_text)
+        return self._search_text(
+            query_text,
+            query_vector,
+            k,
+            distance_measure=distance_measure,
+            return_as_text=return_as_text,
+            filter=filter,
+            mode=mode,
+            min_score=min_score,
+            mmr=mmr,
+            fetch_k=fetch_k,
+            lambda_=lambda_,
+            with_metadata=with_metadata,
+        )
+
+    async def asearch_by_text(
+        self,
+        query_text: str,
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        mode: str = "vector",
+        min_score: Optional[float] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """
+        ``search_by_text`` for async callers: the embedding request is
+        awaited, and scoring moves to a worker thread when the database is
+        large enough to hold up the event loop.
+        """
+        _check_mode(mode, mmr, distance_measure, min_score)
+        query_vector = None
+        if mode != "lexical":
+            query_vector = await self._aembed_query(query_text)
+        search = functools.partial(
+            self._search_text,
+            query_text,
+            query_vector,
+            k,
+            distance_measure=distance_measure,
+            return_as_text=return_as_text,
+            filter=filter,
+            mode=mode,
+            min_score=min_score,
+            mmr=mmr,
+            fetch_k=fetch_k,
+            lambda_=lambda_,
+            with_metadata=with_metadata,
+        )
+        if self._scoring_blocks(distance_measure, mode):
+            return await asyncio.to_thread(search)
+        return search()
+
+    def _scoring_blocks(
+        self, distance_measure: Callable, mode: str, n_queries: int = 1
+    ) -> bool:
+        """Whether scoring the queries is slow enough to run off the event loop."""
+        if not get_metric(distance_measure).vectorized:
+            return True
+        if mode != "vector" and self._lexical is None:
+            return True
+        return n_queries * self._count * self._matrix.shape[1] > _OFFLOAD_ELEMENTS
+
+    def _search_text(
+        self,
+        query_text: str,
+        query_vector: Optional[np.ndarray],
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        mode: str = "vector",
+        min_score: Optional[float] = None,
+        mmr: bool = False,
+        fetch_k: Optional[int] = None,
+        lambda_: float = 0.5,
+        with_metadata: bool = False,
+    ) -> List[Tuple[str, float]]:
+        """Scores ``query_text``, already embedded unless the mode is lexical."""
+        with self.search_stats.timed(mode):
+            if mode == "vector" and not get_metric(distance_measure).is_cosine:
+                results = self.search(
+                    query_vector, k, distance_measure, filter, with_metadata=with_metadata
+                )
+            elif not len(self):
+                results = []
+            else:
+                rows = self._filter_rows(filter)
+                if mode == "lexical":
+                    found, scores = self._lexical_search_rows(query_text, k, rows)
+                else:
+                    query = normalize(query_vector)[0][0]
+                    if mode == "hybrid":
+                        found, scores = self._hybrid_search_rows(query_text, query, k, rows)
+                    elif mmr:
+                        found, scores = self._mmr_search_rows(
+                            query, k, rows, fetch_k, lambda_, min_score
+                        )
+                    elif min_score is not None:
+                        found, scores = self._range_search_rows(query, min_score, k, rows)
+                    else:
+                        found, scores = self._search_rows(query, k, rows)
+                results = self._results(found, scores, with_metadata)
+            if min_score is not None:
+                results = [result for result in results if result[1] >= min_score]
+            return [result[0] for result in results] if return_as_text else results
+
+    def search_by_texts(
+        self,
+        query_texts: List[str],
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        if not query_texts:
+            return []
+        query_vectors = self._embed_queries(query_texts)
+        batches = self.search_many(
+            query_vectors, k, distance_measure, filter, with_metadata
+        )
+        if return_as_text:
+            return [[result[0] for result in results] for results in batches]
+        return batches
+
+    async def asearch_by_texts(
+        self,
+        query_texts: List[str],
+        k: int,
+        distance_measure: Union[str, Callable] = "cosine",
+        return_as_text: bool = False,
+        filter: Optional[Filter] = None,
+        with_metadata: bool = False,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        ``search_by_texts`` for async callers; embeddings and scoring are
+        handled as in ``asearch_by_text``.
+        """
+        if not query_texts:
+            return []
+        query_vectors = await self._aembed_queries(query_texts)
+        search = functools.partial(
+            self.search_many, query_vectors, k, distance_measure, filter, with_metadata
+        )
+        if self._scoring_blocks(distance_measure, "vector", len(query_texts)):
+            batches = await asyncio.to_thread(search)
+        else:
+            batches = search()
+        if return_as_text:
+            return [[result[0] for result in results] for results in batches]
+        return batches
+
+    def _latest_row(self, key: str) -> Optional[int]:
+        """The most recently added live row holding the text ``key``."""
+        rows = self._find_rows([key]).get(key)
+        return rows[-1] if rows else None
+
+    def retrieve_metadata(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        The metadata stored with ``key``, or None for an unknown key. When
+        several chunks hold the same text, this is the latest one's; search
+        with ``with_metadata`` to get each hit's own.
+        """
+        row = self._latest_row(key)
+        if row is None:
+            return None
+        return self._metadata.get(row)
 
     def retrieve_from_key(self, key: str) -> np.array:
-        return self.vectors.get(key, None)
+        row = self._latest_row(key)
+        if row is None:
+            return None
+        return self._matrix[row] * self._norms[row]
 
-    async def abuild_from_list(self, list_of_text: List[str]) -> "VectorDatabase":
-        embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
-        for text, embedding in zip(list_of_text, embeddings):
-            self.insert(text, np.array(embedding))
+    async def abuild_from_list(
+        self,
+        list_of_text: List[str],
+        metadata: Optional[List[Dict[str, Any]]] = None,
+    ) -> "VectorDatabase":
+        """
+        Embeds ``list_of_text`` and adds it as new chunks. With a
+        ``deduplicator``, only chunks that are not near-duplicates are sent
+        to the embedding API; see ``_add_deduplicated``.
+
+        An untrained index is trained on the result, and an index that
+        needs training is retrained whenever the live rows have grown
+        ``_RETRAIN_GROWTH``-fold since; call ``train_index`` to refit it
+        at other times.
+        """
+        if not list_of_text:
+            return self
+        if self.deduplicator is not None:
+            await self._add_deduplicated(list(list_of_text), metadata)
+        else:
+            embeddings = await self.embedding_model.async_get_embeddings(list_of_text)
+            self.add(list_of_text, embeddings, metadata)
+        if self.index is not None and (
+            not self.index.is_trained
+            or self.index.needs_training
+            and len(self) >= _RETRAIN_GROWTH * self._trained_rows
+        ):
+            self.train_index()
         return self
 
+    async def _add_deduplicated(
+        self, texts: List[str], metadata: Optional[List[Dict[str, Any]]]
+    ) -> None:
+        """
+        Embeds the chunks that are not near-duplicates of an earlier chunk of
+        the batch or of a stored chunk. Duplicates are left out with action
+        "drop", or added under the embedding of the chunk they duplicate with
+        action "reuse".
+        """
+        dedup = self.deduplicator
+        if metadata is not None and len(metadata) != len(texts):
+            raise ValueError("metadata must have one entry per text")
+        signatures = dedup.signatures(texts)
+        earlier, existing = dedup.find(signatures)
+        unique = np.flatnonzero((earlier < 0) & (existing < 0))
+        duplicates = np.flatnonzero((earlier >= 0) | (existing >= 0))
+        if len(unique):
+            embeddings = await self.embedding_model.async_get_embeddings(
+                [texts[i] for i in unique]
+            )
+            embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(unique), -1)
+        else:
+            # Every chunk matched a stored one, so the matrix has its width.
+            embeddings = np.empty((0, self._matrix.shape[1]), dtype=np.float32)
+        request_bytes = sum(len(texts[i].encode("utf-8")) for i in duplicates)
+        stored_bytes = 0
+        if dedup.action == "drop" or not len(duplicates):
+            keep = unique
+            vectors = embeddings
+            if len(duplicates):
+                row_bytes = embeddings.shape[1] * self.dtype.itemsize + 4
+                stored_bytes = len(duplicates) * row_bytes + request_bytes
+        else:
+            keep = np.arange(len(texts))
+            vectors = np.empty((len(texts), embeddings.shape[1]), dtype=np.float32)
+            vectors[unique] = embeddings
+            from_batch = np.flatnonzero(earlier >= 0)
+            vectors[from_batch] = vectors[earlier[from_batch]]
+            from_store = np.flatnonzero(existing >= 0)
+            if len(from_store):
+                rows = self._rows_of_ids(existing[from_store].tolist())
+                vectors[from_store] = (
+                    self._matrix[rows].astype(np.float32) * self._norms[rows][:, None]
+                )
+        ids = self.add(
+            [texts[i] for i in keep],
+            vectors,
+            None if metadata is None else [metadata[i] for i in keep],
+        )
+        # Only first occurrences become match targets for later batches.
+        dedup.add(ids[np.isin(keep, unique)], signatures[unique])
+        dedup.record(len(texts), len(duplicates), request_bytes, stored_bytes)
+
+    def save(self, path: str, info: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Writes the index to the directory ``path``.
+
+        Each file is written under a temporary name and renamed into place,
+        so databases (or shard workers) that memory-mapped ``path`` keep
+        reading the previous version; reopen to see the new one.
+
+        :param path: Directory to write to; created if missing
+        :param info: Optional JSON-serializable data stored in the sidecar,
+            e.g. a fingerprint of the corpus the index was built from
+        """
+        self.compact()
+        self._sync_index()
+        os.makedirs(path, exist_ok=True)
+        # Invalidate the directory first, so a save that fails midway leaves
+        # no sidecar pointing at a mix of old and new files.
+        sidecar_path = os.path.join(path, _SIDECAR_FILE)
+        if os.path.exists(sidecar_path):
+            os.remove(sidecar_path)
+        buffer, offsets = self._chunks.state()
+        arrays = {
+            _VECTORS_FILE: self._stored(),
+            _NORMS_FILE: self._norms[: self._count],
+            _CHUNKS_FILE: buffer,
+            _CHUNK_OFFSETS_FILE: offsets,
+            _CHUNK_HASHES_FILE: self._hashes[: self._count],
+            _CHUNK_IDS_FILE: self._ids[: self._count],
+        }
+        for name, array in arrays.items():
+            _replace_file(os.path.join(path, name), functools.partial(np.save, arr=array))
+        sidecar = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "embedding_model": getattr(
+                self.embedding_model, "embeddings_model_name", None
+            ),
+            "embedding_dimensions": getattr(self.embedding_model, "dimensions", None),
+            "count": self._count,
+            "next_id": self._next_id,
+            "metadata": self._metadata.state(self._count),
+            "index": None,
+            "info": info or {},
+        }
+        state_path = os.path.join(path, _INDEX_STATE_FILE)
+        if self.index is not None:
+            sidecar["index"] = {
+                "type": self.index.name,
+                "params": self.index.params(),
+                "trained": self.index.is_trained,
+            }
+            if self.index.is_trained:
+                _replace_file(state_path, functools.partial(np.savez, **self.index.state()))
+        if not sidecar["index"] or not sidecar["index"]["trained"]:
+            if os.path.exists(state_path):
+                os.remove(state_path)
+        # The sidecar goes last, so a directory with one is a complete index.
+        tmp_path = sidecar_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, sidecar_path)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Size, memory and search statistics, for sizing workers and watching
+        for regressions.
+
+        ``bytes`` covers the stored rows of each structure; ``allocated``
+        adds the spare capacity kept for appends. Memory-mapped arrays are
+        counted although the OS pages them in on demand. ``searches`` is
+        cumulative over the database and every ``copy`` made from it, and
+        times scoring only, not query embedding.
+        """
+        dim = self._matrix.shape[1]
+        row_bytes = dim * self.dtype.itemsize + self._norms.itemsize
+        bookkeeping = self._hashes.itemsize + self._ids.itemsize + self._alive.itemsize
+        nbytes = {
+            "vectors": self._count * row_bytes,
+            "text": self._chunks.nbytes,
+            "metadata": self._metadata.nbytes,
+            "ids": self._count * bookkeeping,
+            "lexical": 0 if self._lexical is None else self._lexical.nbytes,
+            "index": 0 if not self._index_ready() else self.index.nbytes,
+        }
+        nbytes["total"] = sum(nbytes.values())
+        index = None
+        if self.index is not None:
+            index = {
+                "type": self.index.name,
+                "params": self.index.params(),
+                "trained": self.index.is_trained,
+                "indexed_rows": self._indexed,
+            }
+        return {
+            "count": len(self),
+            "deleted": self._dead,
+            "capacity": len(self._matrix),
+            "dimensions": dim,
+            "dtype": self.dtype.name,
+            "memory_mapped": self._memory_mapped,
+            "bytes": nbytes,
+            "allocated_bytes": len(self._matrix) * (row_bytes + bookkeeping),
+            "index": index,
+            "query_cache": None if self.query_cache is None else self.query_cache.info(),
+            "deduplicator": None if self.deduplicator is None else self.deduplicator.info(),
+            "searches": self.search_stats.info(),
+        }
+
+    def export_arrow(
+        self, path: str, format: Optional[str] = None, batch_size: Optional[int] = None
+    ) -> None:
+        """
+        Writes the chunks to an Arrow IPC or Parquet file, one row each:
+        id, text, hash, norm, the unit vector as a fixed-size list in the
+        storage dtype, and a struct of dictionary-encoded metadata. Needs
+        pyarrow. The approximate index is not exported, and a database that
+        has never held a vector (so has no vector width) cannot be.
+
+        The columns wrap the database's own arrays, so rows are streamed
+        without Python objects per row.
+
+        :param format: One of ``ARROW_FORMATS``; by default Parquet for a
+            .parquet path, Arrow IPC otherwise
+        :param batch_size: Rows per record batch or Parquet row group. An
+            IPC file written as a single batch (the default) imports with
+            its vectors used in place.
+        """
+        arrow_io.export_arrow(self, path, format, batch_size)
+
+    @classmethod
+    def import_arrow(
+        cls,
+        path: str,
+        embedding_model: EmbeddingModel = None,
+        format: Optional[str] = None,
+    ) -> "VectorDatabase":
+        """
+        Loads a file written by ``export_arrow`` without calling the
+        embedding API. Needs pyarrow.
+
+        An IPC file is memory-mapped, and a single-batch one becomes the
+        search matrix, text store and id arrays with no copy. A Parquet
+        file is decoded into memory. Tables from other tools need ``text``
+        and ``vector`` columns; missing ids, hashes and norms are derived.
+        """
+        db = cls(embedding_model=embedding_model)
+        arrow_io.import_arrow(db, path, format)
+        return db
+
+    @staticmethod
+    def read_info(path: str) -> Dict[str, Any]:
+        """
+        Returns the ``info`` saved with the index at ``path``, or {} if there
+        is none or it was written in a format ``load`` cannot read.
+        """
+        sidecar_path = os.path.join(path, _SIDECAR_FILE)
+        if not os.path.isfile(sidecar_path):
+            return {}
+        with open(sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("format_version") != INDEX_FORMAT_VERSION:
+            return {}
+        return sidecar.get("info", {})
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        embedding_model: EmbeddingModel = None,
+        mmap: bool = True,
+    ) -> "VectorDatabase":
+        """
+        Loads an index written by ``save`` without calling the embedding API.
+
+        :param path: Directory holding the saved index
+        :param embedding_model: Model used for later text queries; must match
+            the model the index was built with
+        :param mmap: Memory-map the vectors read-only instead of reading them
+        """
+        with open(os.path.join(path, _SIDECAR_FILE), "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported index format version: {sidecar.get('format_version')}"
+            )
+        db = cls(embedding_model=embedding_model)
+        model_name = getattr(db.embedding_model, "embeddings_model_name", None)
+        if sidecar["embedding_model"] and model_name != sidecar["embedding_model"]:
+            raise ValueError(
+                f"Index was built with {sidecar['embedding_model']}, "
+                f"not {model_name}"
+            )
+        dimensions = getattr(db.embedding_model, "dimensions", None)
+        if dimensions != sidecar.get("embedding_dimensions"):
+            raise ValueError(
+                f"Index was built with dimensions={sidecar.get('embedding_dimensions')}, "
+                f"not {dimensions}"
+            )
+        mmap_mode = "r" if mmap else None
+        db._matrix = np.load(os.path.join(path, _VECTORS_FILE), mmap_mode=mmap_mode)
+        db._memory_mapped = mmap
+        if db._matrix.dtype.name not in STORAGE_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {db._matrix.dtype}")
+        db.dtype = db._matrix.dtype
+        db._norms = np.load(os.path.join(path, _NORMS_FILE), mmap_mode=mmap_mode)
+        db._chunks = ChunkStore.from_state(
+            np.load(os.path.join(path, _CHUNKS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, _CHUNK_OFFSETS_FILE), mmap_mode=mmap_mode),
+        )
+        db._hashes = np.load(os.path.join(path, _CHUNK_HASHES_FILE))
+        db._ids = np.load(os.path.join(path, _CHUNK_IDS_FILE))
+        db._count = sidecar["count"]
+        if not db._matrix.shape[0] == len(db._chunks) == len(db._ids) == db._count:
+            raise ValueError("Index vectors and chunks are out of sync")
+        db._next_id = sidecar["next_id"]
+        db._alive = np.ones(db._count, dtype=bool)
+        db._metadata = MetadataStore.from_state(sidecar.get("metadata", {}))
+        if sidecar.get("index"):
+            index_type = INDEX_TYPES.get(sidecar["index"]["type"])
+            if index_type is None:
+                raise ValueError(f"Unknown index type: {sidecar['index']['type']}")
+            params = sidecar["index"]["params"]
+            if sidecar["index"]["trained"]:
+                with np.load(os.path.join(path, _INDEX_STATE_FILE)) as state:
+                    db.index = index_type.from_state(params, dict(state))
+                db._indexed = db._trained_rows = db._count
+            else:
+                db.index = index_type(**params)
+        return db
+
 
 if __name__ == "__main__":
     list_of_text = [
@@ -9,11 +9,13 @@ from openai import OpenAI
 import os
 import tempfile
 import asyncio
-from typing import Optional, List, Dict, Any
+import bisect
+from typing import Optional, List, Dict, Any, NamedTuple, Tuple
 import json # Added for json.dumps
 
 # Import RAG utilities
 from aimakerspace.vectordatabase import VectorDatabase
+from aimakerspace.dedup import MinHashDeduplicator
 from aimakerspace.text_utils import PDFLoader, CharacterTextSplitter
 from aimakerspace.openai_utils.embedding import EmbeddingModel
 
@@ -30,12 +32,22 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers in requests
 )
 
-# Global vector database instance - Initialize without embedding model to avoid API key requirement
-vector_db = None
-has_documents = False
-uploaded_docs = []  # Track uploaded documents with metadata
-document_chunks = {}  # Track chunks by document: {filename: [chunks]}
-all_document_chunks = []  # Store all document chunks for rebuilding vector DB
+# Everything a request reads about the uploaded documents, published as one
+# immutable version. Readers take `index_state` once and use that version
+# throughout; writers copy the current database, change the copy, and publish
+# it with a single assignment, so a search never sees a half-built index.
+class IndexState(NamedTuple):
+    version: int
+    vector_db: Optional[VectorDatabase]  # None until the first upload
+    uploaded_docs: Tuple[Dict[str, Any], ...]  # Uploaded documents with metadata
+
+    @property
+    def has_documents(self) -> bool:
+        return self.vector_db is not None and bool(self.uploaded_docs)
+
+index_state = IndexState(version=0, vector_db=None, uploaded_docs=())
+# Uploads and removals run one at a time; searches never wait on it
+index_write_lock = asyncio.Lock()
 stored_api_key = None  # Store API key for rebuilding vector DB
 
 # Define the data model for chat requests using Pydantic
@@ -49,13 +61,7 @@ class ChatRequest(BaseModel):
     model: Optional[str] = "gpt-4o-mini"  # Optional model selection with default
     api_key: str          # OpenAI API key for authentication
     use_rag: Optional[bool] = False  # Whether to use RAG enhancement
-
-# Helper function to initialize vector database with API key
-def initialize_vector_db():
-    global vector_db
-    if vector_db is None:
-        vector_db = VectorDatabase()
-    return vector_db
+    document: Optional[str] = None  # Limit RAG search to one uploaded document
 
 # Define the main chat endpoint that handles POST requests
 @app.post("/api/chat")
@@ -67,8 +73,12 @@ async def chat(request: ChatRequest):
         # Get the user's latest message
         user_message = request.messages[-1].content if request.messages else ""
         
+        # Answer from one version of the index, even if an upload publishes a new one meanwhile
+        state = index_state
+        vector_db, uploaded_docs = state.vector_db, state.uploaded_docs
+        
         # If RAG is requested and we have documents, enhance the query
-        if request.use_rag and has_documents and user_message and vector_db is not None:
+        if request.use_rag and state.has_documents and user_message:
             # Check if this is a meta-query about the system/documents
             meta_query_keywords = [
                 "what documents", "which documents", "what files", "which files",
@@ -99,18 +109,24 @@ I can only answer questions based on the content of these uploaded documents. Pl
                     for msg in request.messages[:-1]
                 ] + [{"role": "user", "content": enhanced_message}]
             else:
-                # For regular queries, search for relevant context with similarity threshold
-                search_results = vector_db.search_by_text(user_message, k=5, return_as_text=False)
-                
-                # Log similarity scores for debugging
-                print(f"Query: {user_message}")
-                print(f"Similarity scores: {[(score, text[:50] + '...') for text, score in search_results]}")
-                
                 # Define confidence thresholds based on actual text-embedding-3-small performance
                 HIGH_CONFIDENCE_THRESHOLD = 0.60  # Top tier relevance - confident answers
                 MEDIUM_CONFIDENCE_THRESHOLD = 0.40  # Moderate relevance - helpful but cautious
                 LOW_CONFIDENCE_THRESHOLD = 0.25   # Below this = "I don't know"
                 
+                # For regular queries, fetch up to 5 chunks that clear the lowest threshold;
+                # an out-of-corpus question comes back empty and skips context assembly.
+                # MMR skips near-copies left by the splitter's overlapping windows.
+                search_filter = {"document": request.document} if request.document else None
+                search_results = await vector_db.asearch_by_text(
+                    user_message, k=5, return_as_text=False, filter=search_filter,
+                    min_score=LOW_CONFIDENCE_THRESHOLD, mmr=True
+                )
+                
+                # Log similarity scores for debugging
+                print(f"Query: {user_message}")
+                print(f"Similarity scores: {[(score, text[:50] + '...') for text, score in search_results]}")
+                
                 high_confidence_contexts = []
                 medium_confidence_contexts = []
                 low_confidence_contexts = []
@@ -201,7 +217,7 @@ Available documents: {', '.join([doc['filename'] for doc in uploaded_docs])}"""
                     ]
         else:
             # No RAG requested or no documents available
-            if not has_documents:
+            if not state.has_documents:
                 enhanced_message = f"""I am a document-only assistant and cannot answer questions without documents. 
 
 Please upload PDF documents first so I can help you with questions about their content.
@@ -294,40 +310,67 @@ async def upload_document(
             loader = PDFLoader(temp_file_path)
             documents = loader.load_documents()
             
-            # Split text
+            # Split text, recording where each chunk came from
             text_splitter = CharacterTextSplitter()
-            split_docs = text_splitter.split_texts(documents)
-            
-            # Initialize vector database with API key
-            global vector_db, has_documents, all_document_chunks, document_chunks, stored_api_key
-            
-            # Store the API key for later use
-            stored_api_key = api_key
-            
-            # Store chunks for this specific document
-            document_chunks[file.filename] = split_docs
-            
-            # Add new chunks to accumulated chunks
-            all_document_chunks.extend(split_docs)
-            
-            # Rebuild vector database with all accumulated chunks
-            vector_db = VectorDatabase(
-                embedding_model=EmbeddingModel(api_key=api_key)
-            )
+            step = text_splitter.chunk_size - text_splitter.chunk_overlap
+            uploaded_at = os.path.getmtime(temp_file_path)
+            split_docs = []
+            chunk_metadata = []
+            for text, page_offsets in zip(documents, loader.page_offsets):
+                for i, chunk in enumerate(text_splitter.split(text)):
+                    split_docs.append(chunk)
+                    chunk_metadata.append({
+                        "document": file.filename,
+                        "page": bisect.bisect_right(page_offsets, i * step),
+                        "offset": i * step,
+                        "uploaded_at": uploaded_at
+                    })
             
-            # Build vector database from all document chunks
-            vector_db = await vector_db.abuild_from_list(all_document_chunks)
+            global index_state, stored_api_key
             
-            # Update global state
-            has_documents = True
-            
-            uploaded_docs.append({
-                "filename": file.filename,
-                "timestamp": os.path.getmtime(temp_file_path),
-                "chunk_count": len(split_docs)
-            })
+            async with index_write_lock:
+                state = index_state
+                
+                # Store the API key for later use
+                stored_api_key = api_key
+                
+                # Build the next version on a copy-on-write copy; readers keep using the current one
+                # Near-duplicate chunks (repeated boilerplate, re-uploads under
+                # another name) reuse an existing embedding instead of a new API
+                # call; each document still keeps its own chunks for removal
+                if state.vector_db is None:
+                    vector_db = VectorDatabase(
+                        embedding_model=EmbeddingModel(api_key=api_key),
+                        deduplicator=MinHashDeduplicator(action="reuse")
+                    )
+                else:
+                    vector_db = state.vector_db.copy()
+                    if vector_db.embedding_model.openai_api_key != api_key:
+                        vector_db.embedding_model = EmbeddingModel(api_key=api_key)
+                
+                # Re-uploading a document replaces its previous chunks
+                uploaded_docs = [doc for doc in state.uploaded_docs if doc['filename'] != file.filename]
+                if len(uploaded_docs) < len(state.uploaded_docs):
+                    vector_db.delete_where({"document": file.filename})
+                
+                # Embed and insert only this document's chunks
+                duplicates_before = vector_db.deduplicator.duplicates
+                vector_db = await vector_db.abuild_from_list(split_docs, metadata=chunk_metadata)
+                reused = vector_db.deduplicator.duplicates - duplicates_before
+                
+                uploaded_docs.append({
+                    "filename": file.filename,
+                    "timestamp": uploaded_at,
+                    "chunk_count": len(split_docs)
+                })
+                
+                # Publish the new version
+                index_state = IndexState(state.version + 1, vector_db, tuple(uploaded_docs))
             
-            return {"message": f"Document {file.filename} uploaded successfully. Total chunks: {len(all_document_chunks)}"}
+            return {
+                "message": f"Document {file.filename} uploaded successfully. Total chunks: {len(vector_db)}",
+                "reused_embeddings": reused
+            }
             
         finally:
             # Clean up temporary file
@@ -340,119 +383,117 @@ async def upload_document(
 # New endpoint to check document status
 @app.get("/api/documents/status")
 async def get_document_status():
+    state = index_state
     return {
-        "has_documents": has_documents,
-        "document_count": len(vector_db.vectors) if has_documents and vector_db else 0,
-        "uploaded_documents": uploaded_docs
+        "has_documents": state.has_documents,
+        "document_count": len(state.vector_db) if state.has_documents else 0,
+        "uploaded_documents": list(state.uploaded_docs),
+        "index_version": state.version
+    }
+
+# Index size, memory and search latency statistics
+@app.get("/api/index/stats")
+async def get_index_stats():
+    state = index_state
+    return {
+        "index_version": state.version,
+        "document_count": len(state.uploaded_docs),
+        "stats": state.vector_db.stats() if state.vector_db is not None else None
     }
 
 # Debug endpoint to test similarity scores
 @app.post("/api/debug/similarity")
 async def debug_similarity(request: dict):
     """Debug endpoint to test similarity scores for a query."""
-    if not has_documents or not vector_db:
+    state = index_state
+    vector_db = state.vector_db
+    if not state.has_documents:
         raise HTTPException(status_code=400, detail="No documents available")
     
     query = request.get("query", "")
-    if not query:
+    queries = request.get("queries") or ([query] if query else [])
+    if not queries:
         raise HTTPException(status_code=400, detail="Query is required")
+    search_filter = {"document": request["document"]} if request.get("document") else None
     
     try:
-        search_results = vector_db.search_by_text(query, k=10, return_as_text=False)
+        # Embed and score every query in one batch
+        batched_results = await vector_db.asearch_by_texts(
+            queries, k=10, return_as_text=False, filter=search_filter, with_metadata=True
+        )
         
-        return {
-            "query": query,
-            "total_chunks": len(all_document_chunks),
-            "results": [
-                {
-                    "similarity_score": float(score),
-                    "text_preview": text[:100] + "..." if len(text) > 100 else text,
-                    "confidence_level": (
-                        "high" if score >= 0.85 else
-                        "medium" if score >= 0.70 else
-                        "low" if score >= 0.55 else
-                        "very_low"
-                    )
-                }
-                for text, score in search_results
-            ]
-        }
+        sweep = [
+            {
+                "query": q,
+                "total_chunks": len(vector_db),
+                "results": [
+                    {
+                        "similarity_score": float(score),
+                        "text_preview": text[:100] + "..." if len(text) > 100 else text,
+                        "metadata": metadata,
+                        "confidence_level": (
+                            "high" if score >= 0.85 else
+                            "medium" if score >= 0.70 else
+                            "low" if score >= 0.55 else
+                            "very_low"
+                        )
+                    }
+                    for text, score, metadata in search_results
+                ]
+            }
+            for q, search_results in zip(queries, batched_results)
+        ]
+        
+        return {"queries": sweep} if request.get("queries") else sweep[0]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing query: {str(e)}")
 
 # New endpoint to remove individual document
 @app.delete("/api/documents/{filename}")
 async def remove_document(filename: str):
-    """Remove a specific document from the uploaded list and rebuild vector database."""
-    global uploaded_docs, vector_db, has_documents, all_document_chunks, document_chunks, stored_api_key
-    
-    # Find the document to remove
-    doc_to_remove = None
-    for doc in uploaded_docs:
-        if doc['filename'] == filename:
-            doc_to_remove = doc
-            break
-    
-    if not doc_to_remove:
-        raise HTTPException(status_code=404, detail=f"Document {filename} not found")
+    """Remove a specific document and its chunks from the vector database."""
+    global index_state, stored_api_key
     
-    # Remove chunks for this document
-    if filename in document_chunks:
-        chunks_to_remove = document_chunks[filename]
+    async with index_write_lock:
+        state = index_state
         
-        # Remove chunks from all_document_chunks
-        for chunk in chunks_to_remove:
-            if chunk in all_document_chunks:
-                all_document_chunks.remove(chunk)
+        # Remove from uploaded documents list
+        uploaded_docs = [doc for doc in state.uploaded_docs if doc['filename'] != filename]
         
-        # Remove from document_chunks tracking
-        del document_chunks[filename]
-    
-    # Remove from uploaded documents list
-    uploaded_docs = [doc for doc in uploaded_docs if doc['filename'] != filename]
-    
-    # If this was the last document, clear everything
-    if not uploaded_docs:
-        vector_db = None
-        has_documents = False
-        all_document_chunks = []
-        document_chunks = {}
-        stored_api_key = None
-        return {"message": f"Document {filename} removed. All documents cleared."}
+        if len(uploaded_docs) == len(state.uploaded_docs):
+            raise HTTPException(status_code=404, detail=f"Document {filename} not found")
+        
+        # If this was the last document, clear everything
+        if not uploaded_docs:
+            index_state = IndexState(state.version + 1, None, ())
+            stored_api_key = None
+            return {"message": f"Document {filename} removed. All documents cleared."}
+        
+        # Delete this document's chunks from a copy; identical text from other documents is stored separately
+        vector_db = state.vector_db.copy()
+        vector_db.delete_where({"document": filename})
+        index_state = IndexState(state.version + 1, vector_db, tuple(uploaded_docs))
     
-    # Rebuild vector database with remaining chunks
-    try:
-        if all_document_chunks and stored_api_key:
-            vector_db = VectorDatabase(
-                embedding_model=EmbeddingModel(api_key=stored_api_key)
-            )
-            vector_db = await vector_db.abuild_from_list(all_document_chunks)
-        else:
-            vector_db = None
-            has_documents = False
-            
-        return {"message": f"Document {filename} removed successfully. Vector database rebuilt with {len(all_document_chunks)} remaining chunks."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error rebuilding vector database: {str(e)}")
+    remaining = len(vector_db)
+    return {"message": f"Document {filename} removed successfully. {remaining} chunks remain in the vector database."}
 
 # New endpoint to get list of uploaded documents
 @app.get("/api/documents/list")
 async def get_uploaded_documents():
+    uploaded_docs = index_state.uploaded_docs
     return {
-        "documents": uploaded_docs,
+        "documents": list(uploaded_docs),
         "total": len(uploaded_docs)
     }
 
 # New endpoint to clear documents
 @app.post("/api/documents/clear")
 async def clear_documents():
-    global has_documents, vector_db, uploaded_docs, all_document_chunks, document_chunks, stored_api_key
-    vector_db = None  # Reset vector database
-    has_documents = False
-    uploaded_docs = []  # Clear uploaded documents list
-    all_document_chunks = []  # Clear accumulated chunks
-    document_chunks = {}  # Clear document chunks tracking
-    stored_api_key = None  # Clear stored API key
+    global index_state, stored_api_key
+    async with index_write_lock:
+        # Publish an empty version; in-flight searches finish on the old one
+        index_state = IndexState(index_state.version + 1, None, ())
+        stored_api_key = None  # Clear stored API key
     return {"message": "Documents cleared successfully"}
 
 # Define a health check endpoint to verify API status
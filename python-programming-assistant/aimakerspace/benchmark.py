@@ -0,0 +1,348 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from aimakerspace.vectordatabase import (
+    INDEX_TYPES,
+    SEARCH_MODES,
+    STORAGE_DTYPES,
+    VectorDatabase,
+)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Synthetic corpora: chunks fall into clusters of about _CLUSTER_SIZE, whose
+# centres lie in a _LATENT_DIMS-dimensional subspace, as real embeddings of
+# related passages do. Each cluster also has _TOPIC_WORDS words its chunks
+# draw from, so lexical search has something to find.
+_CLUSTER_SIZE = 100
+_LATENT_DIMS = 64
+_TOPIC_WORDS = 20
+_VOCABULARY = 50_000
+_WORDS_PER_CHUNK = (8, 12)  # topic words, general words
+_WORDS_PER_QUERY = (4, 1)  # taken from the source chunk's topic and general words
+
+# Spread of a query around its source chunk's point in the cluster subspace,
+# where it competes with the rest of the cluster (spread 0.7). At 2.0 the
+# source is in the exact top 10 for most queries, but not all.
+_QUERY_NOISE = 2.0
+
+# Chunks generated and added per step while building.
+_BLOCK_ROWS = 10_000
+
+_SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+class SyntheticCorpus:
+    """
+    Seeded clustered embeddings with matching chunk text, generated a block
+    at a time so the corpus never exists outside the database being built.
+    """
+
+    def __init__(self, size: int, dim: int = 1536, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        n_clusters = max(1, size // _CLUSTER_SIZE)
+        self.size = size
+        self.dim = dim
+        self.seed = seed
+        self._basis = rng.standard_normal((_LATENT_DIMS, dim), dtype=np.float32)
+        self._basis /= np.sqrt(_LATENT_DIMS)
+        self._centers = rng.standard_normal((n_clusters, _LATENT_DIMS), dtype=np.float32)
+        self._topics = rng.integers(0, _VOCABULARY, (n_clusters, _TOPIC_WORDS))
+
+    def _embed(self, latent: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Full embeddings of points in the cluster subspace, with per-dimension noise."""
+        vectors = latent @ self._basis
+        vectors += 0.5 * rng.standard_normal(vectors.shape, dtype=np.float32)
+        return vectors
+
+    def query_vector(self, latent: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """A query embedding near the chunk at ``latent``, like a paraphrase of it."""
+        noise = _QUERY_NOISE * rng.standard_normal(_LATENT_DIMS, dtype=np.float32)
+        return self._embed(latent + noise, rng)
+
+    def blocks(self) -> Iterator[Tuple[int, List[str], np.ndarray, np.ndarray]]:
+        """
+        Yields ``(first row, texts, embeddings, latent points)`` covering the
+        corpus in order.
+        """
+        for start in range(0, self.size, _BLOCK_ROWS):
+            rng = np.random.default_rng([self.seed, start])
+            n = min(_BLOCK_ROWS, self.size - start)
+            labels = rng.integers(0, len(self._centers), n)
+            latent = self._centers[labels] + 0.7 * rng.standard_normal(
+                (n, _LATENT_DIMS), dtype=np.float32
+            )
+            vectors = self._embed(latent, rng)
+            topic_words = np.take_along_axis(
+                self._topics[labels],
+                rng.integers(0, _TOPIC_WORDS, (n, _WORDS_PER_CHUNK[0])),
+                axis=1,
+            )
+            general_words = rng.integers(0, _VOCABULARY, (n, _WORDS_PER_CHUNK[1]))
+            words = np.concatenate([topic_words, general_words], axis=1)
+            texts = [" ".join(f"w{word}" for word in row) for row in words.tolist()]
+            yield start, texts, vectors, latent
+
+
+class QueryEmbeddings:
+    """Offline stand-in for ``EmbeddingModel`` that returns precomputed query vectors."""
+
+    embeddings_model_name = "synthetic"
+    dimensions = None
+
+    def __init__(self):
+        self.vectors: Dict[str, np.ndarray] = {}
+
+    def get_embedding(self, text: str) -> np.ndarray:
+        return self.vectors[text]
+
+    def get_embeddings(self, list_of_text: List[str]) -> List[np.ndarray]:
+        return [self.vectors[text] for text in list_of_text]
+
+    async def async_get_embedding(self, text: str) -> np.ndarray:
+        return self.vectors[text]
+
+    async def async_get_embeddings(self, list_of_text: List[str]) -> List[np.ndarray]:
+        return self.get_embeddings(list_of_text)
+
+
+def parse_size(size: str) -> int:
+    """Parses corpus sizes such as "1000", "10k" or "1M"."""
+    size = size.strip().lower()
+    multiplier = _SIZE_SUFFIXES.get(size[-1:], 1)
+    return int(float(size.rstrip("km")) * multiplier)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """High-water resident set size of this process, or None where unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _time_queries(search, queries: List[str]) -> Tuple[np.ndarray, List[List[str]]]:
+    """Per-query latencies in seconds and the texts each query returned."""
+    search(queries[0])
+    latencies = np.empty(len(queries))
+    results = []
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies[i] = time.perf_counter() - start
+    return latencies, results
+
+
+def _record(
+    mode: str,
+    index: Optional[str],
+    build_seconds: float,
+    latencies: np.ndarray,
+    results: List[List[str]],
+    exact: List[List[str]],
+    sources: List[str],
+    k: int,
+) -> Dict[str, Any]:
+    recall = [
+        len(set(found) & set(expected)) / len(expected) if expected else 1.0
+        for found, expected in zip(results, exact)
+    ]
+    hits = [source in found for found, source in zip(results, sources)]
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {
+        "mode": mode,
+        "index": index,
+        "k": k,
+        "queries": len(latencies),
+        "build_seconds": round(build_seconds, 4),
+        "p50_ms": round(float(p50), 4),
+        "p99_ms": round(float(p99), 4),
+        "mean_ms": round(float(latencies.mean()) * 1000, 4),
+        "qps": round(len(latencies) / float(latencies.sum()), 2),
+        "recall_at_k": round(float(np.mean(recall)), 4),
+        "hit_rate_at_k": round(float(np.mean(hits)), 4),
+    }
+
+
+def run_size(
+    size: int,
+    dim: int = 1536,
+    n_queries: int = 200,
+    k: int = 10,
+    indexes: Tuple[str, ...] = (),
+    dtype: str = "float32",
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Builds one synthetic corpus and measures every search mode on it.
+
+    ``recall_at_k`` is the overlap with exact cosine top-k, so exact vector
+    search scores 1 and the other rows show how far they drift from it.
+    ``hit_rate_at_k`` is the fraction of queries whose source chunk was
+    returned. ``build_seconds`` covers adding the chunks for exact vector
+    search, building the BM25 index for lexical search and training for an
+    approximate index; hybrid reuses both. ``peak_rss_mb`` is the high-water
+    mark of the whole run for this size, index training included.
+    """
+    corpus = SyntheticCorpus(size, dim, seed)
+    rng = np.random.default_rng([seed, size])
+    source_rows = np.sort(rng.choice(size, min(n_queries, size), replace=False))
+    model = QueryEmbeddings()
+    db = VectorDatabase(embedding_model=model, query_cache_size=0, dtype=dtype)
+    db._reserve(size, dim)
+    sources, queries = [], []
+    build_seconds = 0.0
+    for first, texts, vectors, latent in corpus.blocks():
+        start = time.perf_counter()
+        db.add(texts, vectors)
+        build_seconds += time.perf_counter() - start
+        picked = source_rows[(source_rows >= first) & (source_rows < first + len(texts))]
+        for row in (picked - first).tolist():
+            words = texts[row].split()
+            topic, general = _WORDS_PER_CHUNK[0], sum(_WORDS_PER_CHUNK)
+            chosen = np.concatenate(
+                [
+                    rng.choice(topic, _WORDS_PER_QUERY[0], replace=False),
+                    rng.choice(np.arange(topic, general), _WORDS_PER_QUERY[1], replace=False),
+                ]
+            )
+            query = " ".join(words[i] for i in chosen)
+            model.vectors[query] = corpus.query_vector(latent[row], rng)
+            sources.append(texts[row])
+            queries.append(query)
+
+    def search(mode):
+        return lambda query: db.search_by_text(query, k, return_as_text=True, mode=mode)
+
+    records = []
+    latencies, exact = _time_queries(search("vector"), queries)
+    records.append(
+        _record("vector", None, build_seconds, latencies, exact, exact, sources, k)
+    )
+    start = time.perf_counter()
+    db._lexical_index()
+    lexical_build_seconds = time.perf_counter() - start
+    for mode in [mode for mode in SEARCH_MODES if mode != "vector"]:
+        latencies, results = _time_queries(search(mode), queries)
+        mode_build_seconds = lexical_build_seconds
+        if mode == "hybrid":
+            mode_build_seconds += build_seconds
+        records.append(
+            _record(mode, None, mode_build_seconds, latencies, results, exact, sources, k)
+        )
+    for name in indexes:
+        db.index = INDEX_TYPES[name]()
+        start = time.perf_counter()
+        db.train_index()
+        index_build_seconds = time.perf_counter() - start
+        latencies, results = _time_queries(search("vector"), queries)
+        records.append(
+            _record("vector", name, index_build_seconds, latencies, results, exact, sources, k)
+        )
+        db.index = None
+    stored_bytes = db._stored().nbytes + db._norms[: db._count].nbytes + db._chunks.nbytes
+    peak_rss_mb = _peak_rss_mb()
+    for record in records:
+        record.update(
+            size=size,
+            dim=dim,
+            dtype=dtype,
+            stored_bytes=int(stored_bytes),
+            peak_rss_mb=None if peak_rss_mb is None else round(peak_rss_mb, 1),
+        )
+    return records
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m aimakerspace.benchmark",
+        description=(
+            "Offline VectorDatabase benchmark on seeded synthetic corpora. "
+            "Prints one JSON document with build time, query latency "
+            "percentiles, throughput, peak RSS and recall@k per size and "
+            "search mode."
+        ),
+    )
+    parser.add_argument(
+        "--sizes",
+        default="1k,10k,100k,1M",
+        help="Comma-separated corpus sizes (default: %(default)s); 1M x 1536 "
+        "needs about 9 GB of RAM as float32",
+    )
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument(
+        "--indexes",
+        default="",
+        help="Comma-separated approximate indexes to measure as well: "
+        + ", ".join(INDEX_TYPES),
+    )
+    parser.add_argument("--dtype", default="float32", choices=STORAGE_DTYPES)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    args = parser.parse_args(argv)
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    indexes = tuple(name for name in args.indexes.split(",") if name)
+    unknown = [name for name in indexes if name not in INDEX_TYPES]
+    if unknown:
+        parser.error(f"unknown index types: {', '.join(unknown)}")
+
+    results = []
+    for size in sizes:
+        print(f"benchmarking {size} x {args.dim} ...", file=sys.stderr)
+        # A fresh process per size, so peak RSS belongs to that size alone.
+        with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+            records = pool.submit(
+                run_size, size, args.dim, args.queries, args.k, indexes, args.dtype, args.seed
+            ).result()
+        for record in records:
+            print(
+                f"  {record['mode']:<8} {record['index'] or 'exact':<10} "
+                f"p50 {record['p50_ms']:9.3f} ms  p99 {record['p99_ms']:9.3f} ms  "
+                f"{record['qps']:9.1f} qps  recall@{args.k} {record['recall_at_k']:.3f}  "
+                f"hit@{args.k} {record['hit_rate_at_k']:.3f}",
+                file=sys.stderr,
+            )
+        results.extend(records)
+
+    report = {
+        "benchmark": "aimakerspace.vectordatabase",
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "sizes": sizes,
+            "dim": args.dim,
+            "queries": args.queries,
+            "k": args.k,
+            "indexes": list(indexes),
+            "dtype": args.dtype,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import math
+import re
+import numpy as np
+from array import array
+from collections import Counter
+from typing import Dict, List, Tuple
+from aimakerspace.indexes.base import renumbering
+
+# Words, plus dotted names such as "os.path.join" kept whole.
+_TOKEN_PATTERN = re.compile(r"\w+(?:\.\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens. A dotted name yields itself and its parts, so
+    "itertools.groupby" matches both the qualified and the bare name.
+    """
+    tokens = []
+    for token in _TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if "." in token:
+            tokens.extend(token.split("."))
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index over rows numbered in insertion order.
+
+    Each term's postings are two compact int32 arrays (rows and term
+    frequencies), so a query touches only the rows containing its terms and
+    scores them with vectorized arithmetic.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        :param k1: Term-frequency saturation
+        :param b: Strength of document-length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._lengths = array("i")
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of the postings and document lengths, without the term strings."""
+        postings = sum(
+            rows.itemsize * len(rows) + tf.itemsize * len(tf)
+            for rows, tf in self._postings.values()
+        )
+        return postings + self._lengths.itemsize * len(self._lengths)
+
+    def add(self, texts: List[str]) -> None:
+        """Indexes ``texts`` as the next rows."""
+        for text in texts:
+            row = len(self._lengths)
+            tokens = tokenize(text)
+            self._lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = (array("i"), array("i"))
+                postings[0].append(row)
+                postings[1].append(count)
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every row for ``query``; rows without a match score 0."""
+        size = len(self._lengths)
+        scores = np.zeros(size, dtype=np.float32)
+        if not size:
+            return scores
+        lengths = np.array(self._lengths, dtype=np.float32)
+        length_norm = self.k1 * (1 - self.b + self.b * lengths / max(lengths.mean(), 1.0))
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            # Copies, so the arrays stay appendable while a query runs.
+            rows = np.array(postings[0], dtype=np.int64)
+            tf = np.array(postings[1], dtype=np.float32)
+            idf = math.log(1 + (size - len(rows) + 0.5) / (len(rows) + 0.5))
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + length_norm[rows])
+        return scores
+
+    def copy(self) -> "BM25Index":
+        """An independent copy of the postings, cheaper than reindexing."""
+        index = BM25Index(self.k1, self.b)
+        index._postings = {
+            term: (rows[:], tf[:]) for term, (rows, tf) in self._postings.items()
+        }
+        index._lengths = self._lengths[:]
+        return index
+
+    def compact(self, keep: np.ndarray) -> None:
+        """Keeps only rows ``keep``, renumbered in order."""
+        new_rows = renumbering(keep, len(self._lengths))
+        for term in list(self._postings):
+            rows, tf = self._postings[term]
+            moved = new_rows[np.array(rows, dtype=np.int64)]
+            kept = moved >= 0
+            if not kept.any():
+                del self._postings[term]
+                continue
+            self._postings[term] = (
+                array("i", moved[kept].astype(np.int32).tobytes()),
+                array("i", np.array(tf, dtype=np.int32)[kept].tobytes()),
+            )
+        lengths = np.array(self._lengths, dtype=np.int32)[np.asarray(keep, dtype=np.int64)]
+        self._lengths = array("i", lengths.tobytes())
@@ -0,0 +1,297 @@
+import numpy as np
+from typing import Any, Dict, Tuple
+
+# Rows converted to float32 per step by scan_scores; small enough that the
+# conversion buffer stays in cache.
+_SCAN_BLOCK_ROWS = 128
+
+
+def normalize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns float32 unit-length rows and the original row norms."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1)
+    safe_norms = np.where(norms == 0, 1.0, norms).astype(np.float32)
+    return vectors / safe_norms[:, None], norms.astype(np.float32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, ordered like a stable descending sort."""
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < n:
+        kth = np.partition(scores, n - k)[n - k]
+        candidates = np.flatnonzero(scores >= kth)
+    else:
+        candidates = np.arange(n)
+    order = np.argsort(-scores[candidates], kind="stable")
+    return candidates[order[:k]]
+
+
+def mmr_select(
+    relevance: np.ndarray, similarity: np.ndarray, k: int, lambda_: float
+) -> np.ndarray:
+    """
+    Greedy maximal marginal relevance: indices of up to ``k`` items, each
+    maximizing ``lambda_ * relevance - (1 - lambda_) * redundancy``, where
+    redundancy is the highest ``similarity`` to an item already picked.
+
+    Each step is one vectorized update over all candidates.
+    """
+    k = min(k, len(relevance))
+    picked = np.empty(k, dtype=np.int64)
+    available = np.ones(len(relevance), dtype=bool)
+    gain = np.asarray(relevance, dtype=np.float32)
+    redundancy = None
+    for i in range(k):
+        pick = int(np.argmax(np.where(available, gain, -np.inf)))
+        picked[i] = pick
+        available[pick] = False
+        if redundancy is None:
+            redundancy = similarity[pick].copy()
+        else:
+            np.maximum(redundancy, similarity[pick], out=redundancy)
+        gain = lambda_ * relevance - (1 - lambda_) * redundancy
+    return picked
+
+
+def scan_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Dot products of every row of a matrix with a float32 query, accumulated
+    in float32. A 2-D ``query`` holds one query per row and gets one row of
+    scores each.
+
+    NumPy has no BLAS kernels for compact dtypes (int8, float16, ...), so
+    their rows are widened to float32 a cache-sized block at a time and
+    scored with a float32 matrix product.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    if matrix.dtype == np.float32:
+        return matrix @ query if query.ndim == 1 else query @ matrix.T
+    scores = np.empty(query.shape[:-1] + (len(matrix),), dtype=np.float32)
+    block = np.empty((_SCAN_BLOCK_ROWS, matrix.shape[1]), dtype=np.float32)
+    bits = np.empty(block.shape, dtype=np.int32) if matrix.dtype == np.float16 else None
+    for start in range(0, len(matrix), _SCAN_BLOCK_ROWS):
+        rows = matrix[start : start + _SCAN_BLOCK_ROWS]
+        if bits is not None:
+            _widen_float16(rows, block[: len(rows)], bits[: len(rows)])
+        else:
+            np.copyto(block[: len(rows)], rows, casting="unsafe")
+        scores[..., start : start + len(rows)] = query @ block[: len(rows)].T
+    return scores
+
+
+def _widen_float16(half: np.ndarray, out: np.ndarray, bits: np.ndarray) -> None:
+    """
+    Converts float16 ``half`` into float32 ``out`` with integer operations,
+    about twice as fast as NumPy's float16 cast.
+
+    The sign-extended int16 pattern is shifted into float32 position, the
+    exponent bits set by the sign extension are cleared, and scaling by
+    2**112 rebases the exponent, which also handles subnormals exactly.
+    Infinities and NaN are not preserved; unit vectors never hold them.
+    """
+    np.copyto(bits, half.view(np.int16))
+    np.left_shift(bits, 13, out=bits)
+    np.bitwise_and(bits, np.int32(-0x70000001), out=bits)  # 0x8FFFFFFF
+    np.multiply(bits.view(np.float32), np.float32(2.0**112), out=out)
+
+
+def renumbering(keep: np.ndarray, size: int) -> np.ndarray:
+    """Maps old row numbers below ``size`` to their position in ``keep``, or -1."""
+    new_rows = np.full(size, -1, dtype=np.int64)
+    keep = np.asarray(keep, dtype=np.int64)
+    keep = keep[keep < size]
+    new_rows[keep] = np.arange(len(keep))
+    return new_rows
+
+
+def read_only(array: np.ndarray) -> np.ndarray:
+    """A read-only view of ``array``; writers that check the flag copy first."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def recall_at_k(approximate: np.ndarray, exact: np.ndarray) -> float:
+    """Fraction of the exact top-k rows that the approximate search returned."""
+    if len(exact) == 0:
+        return 1.0
+    return len(np.intersect1d(approximate, exact)) / len(exact)
+
+
+class VectorIndex:
+    """
+    Interface for the approximate indexes a VectorDatabase can search through.
+
+    Indexes only hold row numbers into the database's unit-norm matrix
+    (float32 or float16) plus whatever structure they need; the matrix
+    itself is passed to ``search`` so it can be memory-mapped and shared.
+    """
+
+    name = "base"
+    # Whether ``train`` fits the structure to the data (cells, codebooks,
+    # scales), so that it is worth refitting once the data has grown.
+    needs_training = True
+
+    @property
+    def is_trained(self) -> bool:
+        raise NotImplementedError
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fits the index structure to ``vectors`` and clears any added rows."""
+        raise NotImplementedError
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        """Adds the rows ``rows`` of the unit-norm matrix ``vectors``."""
+        raise NotImplementedError
+
+    def remove(self, rows: np.ndarray) -> None:
+        raise NotImplementedError
+
+    def compact(self, keep: np.ndarray) -> None:
+        """
+        Follows a database compaction: old row ``keep[i]`` becomes row ``i``
+        and every row not in ``keep`` is gone.
+        """
+        raise NotImplementedError
+
+    def search(
+        self, query: np.ndarray, k: int, vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns ``(rows, scores)`` for the approximate top-k of a unit query."""
+        raise NotImplementedError
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate memory of the trained structure, measured on ``state``."""
+        if not self.is_trained:
+            return 0
+        return sum(np.asarray(array).nbytes for array in self.state().values())
+
+    def params(self) -> Dict[str, Any]:
+        """JSON-serializable constructor arguments, saved in the index sidecar."""
+        raise NotImplementedError
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Arrays needed to restore a trained index with ``from_state``."""
+        raise NotImplementedError
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "VectorIndex":
+        raise NotImplementedError
+
+
+class CodeStoreIndex(VectorIndex):
+    """
+    Base for indexes that keep one compact code per row (sign bits, int8
+    values, PQ centroid ids, short prefixes), scan the codes for
+    approximate scores and re-score a shortlist exactly.
+
+    The codes are addressed by row number: ``_present`` marks rows added and
+    not removed, and ``_size`` is one past the highest row added.
+    Subclasses encode rows and score the query against their codes; adding,
+    removing, compacting, the saved state and the re-scoring live here.
+    """
+
+    # Storage dtype of ``_codes``, the axis of it that runs over rows, and
+    # its key in ``state``.
+    code_dtype: Any = np.uint8
+    _row_axis = 0
+    _codes_key = "codes"
+    rerank_k = 0
+
+    def _clear(self, shape: Tuple[int, ...] = (0, 0)) -> None:
+        """Drops every row, leaving codes of the given (empty) shape."""
+        self._codes = np.zeros(shape, dtype=self.code_dtype)
+        self._present = np.zeros(0, dtype=bool)
+        self._size = 0
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Codes of ``vectors``, with rows along ``_row_axis``."""
+        raise NotImplementedError
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate scores of rows ``[0, _size)``, present or not."""
+        raise NotImplementedError
+
+    def _estimates(self, scores: np.ndarray) -> np.ndarray:
+        """Turns approximate scores into the similarities returned unreranked."""
+        return scores
+
+    def _rows(self, codes: np.ndarray) -> np.ndarray:
+        """A view of ``codes`` with rows on the first axis."""
+        return np.moveaxis(codes, self._row_axis, 0)
+
+    def add(self, vectors: np.ndarray, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return
+        codes = self.encode(vectors[rows])
+        size = int(rows.max()) + 1
+        capacity = len(self._present)
+        if size > capacity:
+            capacity = max(size, 2 * capacity, 1024)
+            shape = list(codes.shape)
+            shape[self._row_axis] = capacity
+            grown = np.zeros(shape, dtype=self.code_dtype)
+            if len(self._present):
+                self._rows(grown)[: len(self._present)] = self._rows(self._codes)
+            present = np.zeros(capacity, dtype=bool)
+            present[: len(self._present)] = self._present
+            self._codes, self._present = grown, present
+        self._rows(self._codes)[rows] = self._rows(codes)
+        self._present[rows] = True
+        self._size = max(self._size, size)
+
+    def remove(self, rows: np.ndarray) -> None:
+        rows = np.asarray(rows, dtype=np.int64)
+        self._present[rows[rows < len(self._present)]] = False
+
+    def compact(self, keep: np.ndarray) -> None:
+        self._codes = np.take(self._codes, keep, axis=self._row_axis)
+        self._present = self._present[keep]
+        self._size = len(keep)
+
+    def approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate scores of every stored row; rows not present score -inf."""
+        scores = self._scores(query)
+        scores[~self._present[: self._size]] = -np.inf
+        return scores
+
+    def search(
+        self, query: np.ndarray, k: int, vectors: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.approximate_scores(query)
+        live = int(np.count_nonzero(self._present[: self._size]))
+        if not self.rerank_k:
+            rows = top_k(scores, min(k, live))
+            return rows, self._estimates(scores[rows])
+        shortlist = top_k(scores, min(max(self.rerank_k, k), live))
+        return self._rerank(shortlist, query, vectors, k)
+
+    def _rerank(
+        self, shortlist: np.ndarray, query: np.ndarray, vectors: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact top-k of the ``shortlist`` rows against the full vectors."""
+        # Sorted rows keep reads of memory-mapped vectors sequential.
+        shortlist = np.sort(shortlist)
+        exact = np.asarray(vectors[shortlist] @ query, dtype=np.float32)
+        best = top_k(exact, k)
+        return shortlist[best], exact[best]
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {
+            self._codes_key: np.moveaxis(
+                self._rows(self._codes)[: self._size], 0, self._row_axis
+            ),
+            "present": self._present[: self._size],
+        }
+
+    def _restore(self, state: Dict[str, np.ndarray]) -> None:
+        """Takes the codes and presence back from ``state``."""
+        self._codes = np.array(state[self._codes_key], dtype=self.code_dtype)
+        self._present = np.array(state["present"], dtype=bool)
+        self._size = len(self._present)
@@ -0,0 +1,67 @@
+import numpy as np
+from typing import Tuple
+
+# Assignment is done in blocks of rows to bound the points-by-centroids
+# score matrix.
+_ASSIGN_BLOCK = 8192
+
+
+def assign(
+    data: np.ndarray, centroids: np.ndarray, spherical: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Assigns each row of ``data`` to its nearest centroid.
+
+    :return: ``(labels, scores)`` where scores are dot products for spherical
+        k-means and negated squared distances otherwise
+    """
+    labels = np.empty(len(data), dtype=np.int64)
+    scores = np.empty(len(data), dtype=np.float32)
+    half_norms = 0.0 if spherical else 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    for start in range(0, len(data), _ASSIGN_BLOCK):
+        block = data[start : start + _ASSIGN_BLOCK]
+        similarity = block @ centroids.T - half_norms
+        block_labels = similarity.argmax(axis=1)
+        labels[start : start + len(block)] = block_labels
+        best = similarity[np.arange(len(block)), block_labels]
+        if not spherical:
+            best = 2.0 * best - np.einsum("ij,ij->i", block, block)
+        scores[start : start + len(block)] = best
+    return labels, scores
+
+
+def kmeans(
+    data: np.ndarray,
+    n_clusters: int,
+    n_iter: int = 20,
+    seed: int = 0,
+    spherical: bool = False,
+) -> np.ndarray:
+    """
+    Lloyd's k-means with random initialization.
+
+    With ``spherical=True`` centroids are kept unit-length and points are
+    assigned by dot product, which clusters unit vectors by cosine similarity.
+
+    :return: ``(n_clusters, dim)`` float32 centroids
+    """
+    data = np.asarray(data, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        labels, _ = assign(data, centroids, spherical)
+        counts = np.bincount(labels, minlength=n_clusters)
+        order = np.argsort(labels, kind="stable")
+        cells, starts = np.unique(labels[order], return_index=True)
+        sums = np.zeros_like(centroids)
+        sums[cells] = np.add.reduceat(data[order], starts, axis=0)
+        empty = counts == 0
+        # Reseed empty clusters on random points so every centroid stays live.
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]
+        counts[empty] = 1
+        centroids = sums / counts[:, None].astype(np.float32)
+        if spherical:
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1.0, norms)
+    return centroids.astype(np.float32)
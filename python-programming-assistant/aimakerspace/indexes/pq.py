@@ -0,0 +1,129 @@
+import numpy as np
+from typing import Any, Dict, Optional
+from aimakerspace.indexes.base import CodeStoreIndex
+from aimakerspace.indexes.kmeans import assign, kmeans
+
+
+def _default_subvectors(dim: int) -> int:
+    """Largest divisor of ``dim`` giving sub-vectors of at least 16 dims."""
+    for n_subvectors in range(max(1, dim // 16), 0, -1):
+        if dim % n_subvectors == 0:
+            return n_subvectors
+    return 1
+
+
+class PQIndex(CodeStoreIndex):
+    """
+    Product quantization: each unit vector is split into ``n_subvectors``
+    slices and every slice is stored as the uint8 id of its nearest
+    codebook centroid, so a 1536-dim vector takes 96 bytes instead of 6 KB.
+
+    Queries are scored with asymmetric distance computation: one lookup table
+    of query-slice/centroid dot products per slice, summed over the codes.
+    The best ``rerank_k`` candidates are then optionally re-scored exactly
+    against the float vectors, which only touches those rows when the
+    database was loaded with ``mmap=True``.
+    """
+
+    name = "pq"
+    # One row of codes per slice, so each slice's lookup gathers contiguously.
+    _row_axis = 1
+
+    def __init__(
+        self,
+        n_subvectors: Optional[int] = None,
+        rerank_k: int = 100,
+        n_iter: int = 10,
+        max_train_points: int = 16384,
+        seed: int = 0,
+    ):
+        """
+        :param n_subvectors: Slices per vector; must divide the dimension.
+            Defaults to 16-dim slices
+        :param rerank_k: Shortlist size re-scored exactly; 0 returns the
+            approximate scores as they are
+        :param n_iter: k-means iterations per codebook
+        :param max_train_points: Training sample size
+        :param seed: Seed for the training sample and initialization
+        """
+        self.n_subvectors = n_subvectors
+        self.rerank_k = rerank_k
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None
+        self._clear()
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    def _slices(self, vectors: np.ndarray) -> np.ndarray:
+        """Reshapes ``(n, dim)`` vectors to ``(n_subvectors, n, sub_dim)``."""
+        n_subvectors = self.codebooks.shape[0]
+        return vectors.reshape(len(vectors), n_subvectors, -1).transpose(1, 0, 2)
+
+    def train(self, vectors: np.ndarray) -> None:
+        dim = vectors.shape[1]
+        n_subvectors = self.n_subvectors or _default_subvectors(dim)
+        if dim % n_subvectors:
+            raise ValueError(
+                f"n_subvectors={n_subvectors} does not divide dimension {dim}"
+            )
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), self.max_train_points)
+        sample = np.asarray(
+            vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))],
+            dtype=np.float32,
+        )
+        sample = sample.reshape(sample_size, n_subvectors, -1)
+        n_centroids = min(256, sample_size)
+        self.codebooks = np.stack(
+            [
+                kmeans(sample[:, j], n_centroids, n_iter=self.n_iter, seed=self.seed + j)
+                for j in range(n_subvectors)
+            ]
+        )
+        self._clear((n_subvectors, 0))
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Returns ``(n_subvectors, n)`` uint8 codes for ``vectors``."""
+        slices = self._slices(np.asarray(vectors, dtype=np.float32))
+        return np.stack(
+            [
+                assign(slices[j], self.codebooks[j])[0].astype(np.uint8)
+                for j in range(len(self.codebooks))
+            ]
+        )
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """ADC scores of every stored row."""
+        size = self._size
+        tables = np.einsum("mcd,md->mc", self.codebooks, self._slices(query[None, :])[:, 0])
+        scores = np.zeros(size, dtype=np.float32)
+        gathered = np.empty(size, dtype=np.float32)
+        for table, codes in zip(tables.astype(np.float32), self._codes[:, :size]):
+            np.take(table, codes, out=gathered)
+            scores += gathered
+        return scores
+
+    def params(self) -> Dict[str, Any]:
+        return {
+            "n_subvectors": self.n_subvectors,
+            "rerank_k": self.rerank_k,
+            "n_iter": self.n_iter,
+            "max_train_points": self.max_train_points,
+            "seed": self.seed,
+        }
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks, **super().state()}
+
+    @classmethod
+    def from_state(
+        cls, params: Dict[str, Any], state: Dict[str, np.ndarray]
+    ) -> "PQIndex":
+        index = cls(**params)
+        index.codebooks = state["codebooks"]
+        index._restore(state)
+        return index
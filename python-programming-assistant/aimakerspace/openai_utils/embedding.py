@@ -7,7 +7,12 @@ import asyncio
 
 
 class EmbeddingModel:
-    def __init__(self, embeddings_model_name: str = "text-embedding-3-small", api_key: str = None):
+    def __init__(
+        self,
+        embeddings_model_name: str = "text-embedding-3-small",
+        api_key: str = None,
+        dimensions: int = None,
+    ):
         load_dotenv()
         
         # Use provided API key or fall back to environment variable
@@ -27,6 +32,15 @@ class EmbeddingModel:
         
         openai.api_key = self.openai_api_key
         self.embeddings_model_name = embeddings_model_name
+        # text-embedding-3 models can return shortened embeddings; None keeps
+        # the model's full width.
+        self.dimensions = dimensions
+
+    def _request_params(self) -> dict:
+        params = {"model": self.embeddings_model_name}
+        if self.dimensions is not None:
+            params["dimensions"] = self.dimensions
+        return params
 
     async def async_get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
         batch_size = 1024
@@ -34,7 +48,7 @@ class EmbeddingModel:
         
         async def process_batch(batch):
             embedding_response = await self.async_client.embeddings.create(
-                input=batch, model=self.embeddings_model_name
+                input=batch, **self._request_params()
             )
             return [embeddings.embedding for embeddings in embedding_response.data]
         
@@ -46,21 +60,21 @@ class EmbeddingModel:
 
     async def async_get_embedding(self, text: str) -> List[float]:
         embedding = await self.async_client.embeddings.create(
-            input=text, model=self.embeddings_model_name
+            input=text, **self._request_params()
         )
 
         return embedding.data[0].embedding
 
     def get_embeddings(self, list_of_text: List[str]) -> List[List[float]]:
         embedding_response = self.client.embeddings.create(
-            input=list_of_text, model=self.embeddings_model_name
+            input=list_of_text, **self._request_params()
         )
 
         return [embeddings.embedding for embeddings in embedding_response.data]
 
     def get_embedding(self, text: str) -> List[float]:
         embedding = self.client.embeddings.create(
-            input=text, model=self.embeddings_model_name
+            input=text, **self._request_params()
         )
 
         return embedding.data[0].embedding
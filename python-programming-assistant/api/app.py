@@ -8,14 +8,15 @@ from pydantic import BaseModel
 from openai import OpenAI
 import os
 import asyncio
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 import json
+import hashlib
 from pathlib import Path
 
 # Import our RAG utilities - using relative imports for self-containment
 import sys
 sys.path.append('..')
-from aimakerspace.vectordatabase import VectorDatabase
+from aimakerspace.vectordatabase import SEARCH_MODES, VectorDatabase
 from aimakerspace.text_utils import CharacterTextSplitter
 from aimakerspace.openai_utils.embedding import EmbeddingModel
 from aimakerspace.openai_utils.chatmodel import ChatOpenAI
@@ -47,6 +48,7 @@ class ChatRequest(BaseModel):
     user_message: str
     api_key: str
     model: Optional[str] = "gpt-4o-mini"
+    document: Optional[str] = None  # Limit the search to one documentation file
 
 class InitializeRequest(BaseModel):
     api_key: str
@@ -56,6 +58,7 @@ class StatusResponse(BaseModel):
     initialized: bool
     documents_loaded: int
     vector_db_size: int
+    index_stats: Optional[Dict[str, Any]] = None  # VectorDatabase.stats()
 
 # Initialize the RAG system
 async def initialize_rag_system(api_key: str):
@@ -90,20 +93,39 @@ async def initialize_rag_system(api_key: str):
         
         # Split documents into chunks
         text_splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
+        step = text_splitter.chunk_size - text_splitter.chunk_overlap
         all_chunks = []
+        chunk_metadata = []
         
         for i, doc in enumerate(documents):
             chunks = text_splitter.split(doc)
-            # Add metadata to chunks
-            for chunk in chunks:
-                chunk_with_metadata = f"[From: {doc_files[i]}]\n{chunk}"
-                all_chunks.append(chunk_with_metadata)
+            # Record the source file of each chunk as metadata
+            for j, chunk in enumerate(chunks):
+                all_chunks.append(chunk)
+                chunk_metadata.append({"document": doc_files[i], "offset": j * step})
         
         print(f"🔧 Created {len(all_chunks)} chunks from documentation")
         
-        # Build vector database
-        print("🧠 Building vector database (this may take a moment)...")
-        vector_db = await vector_db.abuild_from_list(all_chunks)
+        # Reuse the saved index when it was built from exactly these chunks
+        index_dir = Path("../index")  # From api/ to index/
+        corpus_hash = hashlib.sha256(
+            "\0".join(
+                [embedding_model.embeddings_model_name]
+                + [
+                    f"{meta['document']}\0{chunk}"
+                    for meta, chunk in zip(chunk_metadata, all_chunks)
+                ]
+            ).encode("utf-8")
+        ).hexdigest()
+        
+        if VectorDatabase.read_info(str(index_dir)).get("corpus_hash") == corpus_hash:
+            print("💾 Loading saved vector index...")
+            vector_db = VectorDatabase.load(str(index_dir), embedding_model=embedding_model)
+        else:
+            # Build vector database
+            print("🧠 Building vector database (this may take a moment)...")
+            vector_db = await vector_db.abuild_from_list(all_chunks, metadata=chunk_metadata)
+            vector_db.save(str(index_dir), info={"corpus_hash": corpus_hash})
         
         is_initialized = True
         print("✅ PyPal RAG system initialized successfully!")
@@ -138,7 +160,8 @@ async def get_status():
         status="ready" if is_initialized else "not_initialized",
         initialized=is_initialized,
         documents_loaded=documents_loaded,
-        vector_db_size=len(vector_db.vectors) if vector_db else 0
+        vector_db_size=len(vector_db.vectors) if vector_db else 0,
+        index_stats=vector_db.stats() if vector_db else None
     )
 
 @app.post("/api/chat")
@@ -155,14 +178,19 @@ async def chat_with_assistant(request: ChatRequest):
     
     try:
         # Search for relevant context
-        relevant_docs = vector_db.search_by_text(
+        relevant_docs = await vector_db.asearch_by_text(
             request.user_message, 
             k=3,  # Get top 3 most relevant chunks
-            return_as_text=True
+            filter={"document": request.document} if request.document else None,
+            mode="hybrid",  # Keyword lookups like "os.walk" also match lexically
+            with_metadata=True
         )
         
-        # Create context from relevant documents
-        context = "\n\n".join(relevant_docs)
+        # Create context from relevant documents, labelled with their source file
+        context = "\n\n".join(
+            f"[From: {metadata.get('document')}]\n{text}"
+            for text, _, metadata in relevant_docs
+        )
         
         # Create the prompt for the LLM
         system_prompt = """You are PyPal, a Python Programming Assistant. You help developers with Python programming questions by providing accurate, helpful information based on the Python documentation provided.
@@ -213,24 +241,34 @@ Answer:"""
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
 
 @app.get("/api/search")
-async def search_documentation(query: str, k: int = 5):
+async def search_documentation(
+    query: str, k: int = 5, document: Optional[str] = None, mode: str = "vector"
+):
     """Search the Python documentation for relevant information"""
     global vector_db, is_initialized
     
     if not is_initialized or not vector_db:
         raise HTTPException(status_code=400, detail="System not initialized")
     
+    if mode not in SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(SEARCH_MODES)}")
+    
     try:
         # Search for relevant documents
-        results = vector_db.search_by_text(query, k=k, return_as_text=False)
+        results = await vector_db.asearch_by_text(
+            query, k=k, return_as_text=False,
+            filter={"document": document} if document else None,
+            mode=mode, with_metadata=True
+        )
         
         # Format results
         formatted_results = []
-        for text, score in results:
+        for text, score, metadata in results:
             formatted_results.append({
                 "content": text[:500] + "..." if len(text) > 500 else text,
                 "similarity_score": float(score),
-                "snippet": text.split('\n')[0]  # First line as snippet
+                "snippet": text.split('\n')[0],  # First line as snippet
+                "source": metadata.get("document")
             })
         
         return {
@@ -6,6 +6,8 @@ Test suite for the RAG-powered Python documentation assistant
 import requests
 import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Configuration - PyPal runs on port 8001
@@ -37,6 +39,10 @@ def test_status():
             print(f"   Initialized: {status['initialized']}")
             print(f"   Python docs loaded: {status['documents_loaded']}")
             print(f"   Vector DB size: {status['vector_db_size']}")
+            stats = status.get('index_stats')
+            if stats:
+                print(f"   Index memory: {stats['bytes']['total'] / 2**20:.1f} MiB ({stats['dtype']})")
+                print(f"   Searches served: {stats['searches']['calls']}")
         else:
             print(f"❌ Status check failed: {response.status_code}")
     except Exception as e:
@@ -133,6 +139,41 @@ def test_search():
     except Exception as e:
         print(f"❌ Search error: {e}")
 
+def test_concurrent_search():
+    """Test that concurrent searches are served in parallel, not one after another"""
+    print("\n🔍 Testing PyPal concurrent searches...")
+    try:
+        # Each round gets its own terms, none searched before: the server
+        # caches query embeddings, and cache hits would skip the very
+        # embedding requests whose overlap is being measured
+        sequential_terms = ["string formatting", "exception handling", "generator expressions", "os.walk"]
+        concurrent_terms = ["context managers", "list slicing", "class inheritance", "pathlib.Path"]
+        
+        def search(term):
+            return requests.get(f"{API_BASE_URL}/api/search", params={"query": term, "k": 3})
+        
+        start = time.perf_counter()
+        sequential = [search(term) for term in sequential_terms]
+        sequential_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(concurrent_terms)) as pool:
+            concurrent = list(pool.map(search, concurrent_terms))
+        concurrent_time = time.perf_counter() - start
+        
+        if all(r.status_code == 200 for r in sequential + concurrent):
+            print(f"   {len(concurrent_terms)} searches: {sequential_time:.2f}s sequential, {concurrent_time:.2f}s concurrent")
+            # Each search waits on an embedding request; if they did not
+            # overlap, the concurrent batch would take as long as the sequential one
+            if concurrent_time < 0.75 * sequential_time:
+                print("✅ Concurrent searches overlap")
+            else:
+                print("❌ Concurrent searches appear to be serialized")
+        else:
+            print(f"❌ Search failed: {[r.status_code for r in sequential + concurrent]}")
+    except Exception as e:
+        print(f"❌ Concurrent search error: {e}")
+
 def main():
     """Run all PyPal tests"""
     print("🧪 Testing PyPal - Python Programming Assistant")
@@ -157,6 +198,7 @@ def main():
         if initialized:
             test_chat()
             test_search()
+            test_concurrent_search()
     else:
         print("\n⚠️  To test initialization, chat, and search:")
         print("   export OPENAI_API_KEY='your-openai-api-key'")